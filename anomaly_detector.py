@@ -0,0 +1,139 @@
+"""
+Ingest-time anomaly detection for Algae Box sensor readings
+Flags spikes, stuck probes and impossible values per tank and channel
+"""
+
+import threading
+from collections import deque
+from copy import copy
+
+# Smallest deviation worth calling a spike, per channel (roughly sensor resolution),
+# and the physically possible range of each channel
+CHANNEL_RESOLUTION = {'ph': 0.05, 'temperature_c': 0.2, 'turbidity_ntu': 2.0}
+CHANNEL_RANGE = {'ph': (0.0, 14.0), 'temperature_c': (-5.0, 60.0), 'turbidity_ntu': (0.0, 4000.0)}
+
+# How long a channel must report exactly the same value before it counts as stuck.
+# Temperature is held steady by the heater and reads in coarse steps, so it gets far longer.
+STUCK_SECONDS = {'ph': 30 * 60, 'temperature_c': 12 * 3600, 'turbidity_ntu': 30 * 60}
+
+
+class ChannelWindow:
+    """Last `size` values of one tank's channel plus when its current repeat run started"""
+
+    __slots__ = ('values', 'last', 'run_start')
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.last = None
+        self.run_start = None
+
+    def __copy__(self):
+        clone = ChannelWindow(self.values.maxlen)
+        clone.values.extend(self.values)
+        clone.last = self.last
+        clone.run_start = self.run_start
+        return clone
+
+
+def _median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+class AnomalyDetector:
+    """Rolling median/MAD spike test and repeat-run stuck test per tank and channel
+
+    Each channel keeps a ring buffer of its last `window` values, so memory
+    per tank is fixed and each reading costs O(window) with a fixed window.
+    A value is a spike when it is more than `z_threshold` robust standard
+    deviations (1.4826 * MAD) from the window median; a probe is stuck when
+    the same value has been reported for its channel's `stuck_seconds`.
+
+    Flags for readings about to be stored come from `score`, which leaves
+    the windows alone; `observe` adds a reading once it is committed, so a
+    retried or failed insert never enters the windows twice.
+    """
+
+    def __init__(self, window=30, min_history=10, z_threshold=6.0, stuck_seconds=None):
+        self.window = window
+        self.min_history = min_history
+        self.z_threshold = z_threshold
+        self.stuck_seconds = dict(STUCK_SECONDS, **(stuck_seconds or {}))
+        self._tanks = {}  # tank_id -> {channel: ChannelWindow}
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.flagged = 0
+
+    def _advance(self, channels, reading):
+        """Test `reading` against a tank's windows and add it to them; returns its flags"""
+        flags = []
+        for channel, state in channels.items():
+            value = reading.get(channel)
+            if value is None:
+                continue
+            low, high = CHANNEL_RANGE[channel]
+            if not low <= value <= high:
+                # Impossible values would drag the window; keep them out of it
+                flags.append(f'{channel}:range')
+                continue
+
+            if len(state.values) >= self.min_history:
+                median = _median(state.values)
+                mad = _median([abs(v - median) for v in state.values])
+                scale = max(1.4826 * mad, CHANNEL_RESOLUTION[channel])
+                if abs(value - median) > self.z_threshold * scale:
+                    flags.append(f'{channel}:spike')
+
+            if value != state.last:
+                state.last = value
+                state.run_start = reading['timestamp']
+            elif (reading['timestamp'] - state.run_start).total_seconds() >= self.stuck_seconds[channel]:
+                flags.append(f'{channel}:stuck')
+            state.values.append(value)
+        return ','.join(flags) or None
+
+    def score(self, readings):
+        """Flags for a batch of readings (dicts with tank_id, timestamp and channels), in order
+
+        Each reading is tested against the windows as the earlier readings
+        of the batch would leave them, using scratch copies: the detector's
+        own windows are unchanged until the readings are observed. Flags are
+        'channel:kind' joined by commas (kind is spike, stuck or range), or
+        None when nothing is wrong.
+        """
+        scratch = {}
+        with self._lock:
+            for reading in readings:
+                tank_id = reading['tank_id']
+                if tank_id not in scratch:
+                    channels = self._tanks.get(tank_id)
+                    scratch[tank_id] = {c: copy(w) for c, w in channels.items()} if channels else \
+                        {c: ChannelWindow(self.window) for c in CHANNEL_RESOLUTION}
+        return [self._advance(scratch[reading['tank_id']], reading) for reading in readings]
+
+    def observe(self, tank_id, reading):
+        """Add a stored reading to the windows; returns its flags as in `score`"""
+        with self._lock:
+            channels = self._tanks.get(tank_id)
+            if channels is None:
+                channels = self._tanks[tank_id] = {c: ChannelWindow(self.window) for c in CHANNEL_RESOLUTION}
+            flags = self._advance(channels, reading)
+            self.observed += 1
+            if flags:
+                self.flagged += 1
+        return flags
+
+    def reset(self, tank_id):
+        """Forget a tank's windows (history cleared or tank deleted)"""
+        with self._lock:
+            self._tanks.pop(tank_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tanks': len(self._tanks),
+                'window': self.window,
+                'observed': self.observed,
+                'flagged': self.flagged
+            }
@@ -3,14 +3,38 @@ Flask REST API Server for Algae Box System - PythonAnywhere Version
 Provides endpoints for mobile app to interact with sensors and database
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from datetime import datetime, timedelta
-from database import db, Tank, SensorReading, CollectionEvent, AlgaeSpecies, UserAction
-from sqlalchemy import desc
+from database import (db, Tank, SensorReading, SensorRollup, CollectionEvent, AlgaeSpecies, UserAction,
+                      ROLLUP_GRANULARITIES, EPOCH, apply_rollups, bucket_start, rollups_backfilled)
+from ingest_buffer import IngestBuffer, BufferFull
+from tank_cache import TankStateCache
+from species_catalog import SpeciesCatalog
+from sensor_stream import ReadingBroadcaster, format_event
+from compression import ResponseCompressor
+from harvest_estimator import HarvestEstimator
+from anomaly_detector import AnomalyDetector
+from recommendations import recommend, trend_features, TREND_HOURS, THRESHOLD_COLUMNS
+from sqlalchemy import bindparam, desc, insert, func, cast, literal_column, select, text, tuple_, DateTime, Integer
+import pandas as pd
+import json
+import math
+import queue
 import sys
 import os
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Columnar history responses are optional
+    pa = None
+
+try:
+    import orjson
+except ImportError:  # Compact history falls back to the stdlib encoder
+    orjson = None
+
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
@@ -20,6 +44,366 @@ CORS(app)  # Enable CORS for mobile app access
 # Initialize database
 db.init_db()
 
+# Fields every sensor payload from the ESP32 must carry
+READING_REQUIRED_FIELDS = ['tank_id', 'turbidity', 'ph', 'temperature']
+
+# Upper bound on readings accepted by one batch request
+MAX_BATCH_READINGS = 1000
+
+# Columnar history formats, negotiated via Accept or ?format=
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_MIMETYPE = 'application/vnd.apache.parquet'
+
+# Keyset pagination page size cap, and rows fetched per round trip when exporting
+MAX_HISTORY_PAGE = 10000
+EXPORT_FETCH_SIZE = 1000
+
+# Server-Sent Events: readings replayed per connection on resume, keep-alive
+# interval, and the reconnect delay after a replay cut short at the limit
+STREAM_REPLAY_LIMIT = 1000
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_CATCHUP_RETRY_MS = 500
+
+# Sensor channels aggregated by downsampled history
+HISTORY_CHANNELS = ['ph', 'temperature_c', 'turbidity_ntu']
+
+# Column layout of raw and bucketed history rows
+RAW_HISTORY_COLUMNS = ['id', 'timestamp'] + HISTORY_CHANNELS
+BUCKET_HISTORY_COLUMNS = ['bucket', 'count'] + [name for channel in HISTORY_CHANNELS
+                                                for name in (channel, f'{channel}_min', f'{channel}_max')]
+
+# Bucketed deltas: oldest in-window reading a tank got since `after_id` (however
+# late it arrived), and the newest id overall. NOT INDEXED walks just the rowid range
+# of new rows instead of every index entry of the tank; one statement keeps both
+# values from the same snapshot.
+HISTORY_DELTA_SQL = text(
+    'SELECT (SELECT min(timestamp) FROM sensor_readings NOT INDEXED'
+    '        WHERE rowid > :after_id AND tank_id = :tank_id AND timestamp >= :cutoff) AS oldest,'
+    '       (SELECT max(id) FROM sensor_readings) AS last_id'
+).bindparams(bindparam('cutoff', type_=DateTime)).columns(oldest=DateTime, last_id=Integer)
+
+# Oldest and newest stored ids; separate subqueries so each is one b-tree seek
+HISTORY_ID_RANGE_SQL = text(
+    'SELECT (SELECT min(id) FROM sensor_readings) AS first_id,'
+    '       (SELECT max(id) FROM sensor_readings) AS last_id'
+).columns(first_id=Integer, last_id=Integer)
+
+# A bucketed delta whose `after_id` is further behind than this many ids (or
+# older than the oldest stored reading, i.e. past retention) reloads the window
+# instead: the delta would walk every tank's rows since then.
+HISTORY_DELTA_MAX_IDS = 20000
+
+# gzip/brotli for JSON and Arrow bodies of at least ALGAE_COMPRESS_MIN_BYTES
+compressor = ResponseCompressor(min_size=int(os.environ.get('ALGAE_COMPRESS_MIN_BYTES', 1024)))
+
+# Latest reading + species thresholds per tank for the hot read endpoints
+tank_cache = TankStateCache(ttl=float(os.environ.get('ALGAE_CACHE_TTL', 30)),
+                            max_age=float(os.environ.get('ALGAE_CACHE_MAX_AGE', 300)))
+
+# Live reading fan-out for /api/sensors/stream/<tank_id>
+broadcaster = ReadingBroadcaster()
+
+# Per-tank turbidity growth fits behind the harvest forecast, updated per reading
+harvest_estimator = HarvestEstimator(half_life_hours=float(os.environ.get('ALGAE_HARVEST_HALF_LIFE_HOURS', 12)))
+
+# Spike / stuck-probe detection: readings are scored before they are stored
+# and enter the detector's windows once committed
+anomaly_detector = AnomalyDetector(
+    window=int(os.environ.get('ALGAE_ANOMALY_WINDOW', 30)),
+    z_threshold=float(os.environ.get('ALGAE_ANOMALY_Z', 6.0))
+)
+
+# Most flagged readings returned by /api/sensors/anomalies
+MAX_ANOMALIES = 1000
+
+# Turbidity flags (bubbles, fouling, bad values) kept out of the harvest growth fit
+HARVEST_SKIP_FLAGS = {'turbidity_ntu:spike', 'turbidity_ntu:range'}
+
+
+def _load_species_rows():
+    """All AlgaeSpecies rows as plain dicts"""
+    session = db.get_session()
+    try:
+        columns = AlgaeSpecies.__table__.columns.keys()
+        return [{name: getattr(s, name) for name in columns}
+                for s in session.query(AlgaeSpecies).order_by(AlgaeSpecies.id)]
+    finally:
+        session.close()
+
+
+# Species are static after seeding: load once, revalidate every few minutes
+species_catalog = SpeciesCatalog(_load_species_rows,
+                                 refresh_interval=float(os.environ.get('ALGAE_SPECIES_REFRESH', 300)))
+
+
+def _naive_local(timestamp):
+    """Timestamp as naive local time, the form readings are stored in"""
+    # An offset-aware timestamp could not be compared with stored readings or bucketed
+    return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+
+def _reading_row(data):
+    """Validate one sensor payload and map it to SensorReading column values"""
+    if not isinstance(data, dict):
+        raise ValueError('Reading must be a JSON object')
+    for field in READING_REQUIRED_FIELDS:
+        if field not in data:
+            raise ValueError(f'Missing field: {field}')
+
+    try:
+        row = {
+            'tank_id': int(data['tank_id']),
+            'turbidity_ntu': float(data['turbidity']),
+            'ph': float(data['ph']),
+            'temperature_c': float(data['temperature']),
+        }
+        # Buffered readings carry the time they were taken on the device
+        timestamp = datetime.fromisoformat(data['timestamp']) if data.get('timestamp') else datetime.now()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid reading value: {e}')
+    for field, column in (('turbidity', 'turbidity_ntu'), ('ph', 'ph'), ('temperature', 'temperature_c')):
+        if not math.isfinite(row[column]):
+            raise ValueError(f'Invalid reading value: {field} is {row[column]}')
+    # Readings are stored as naive local time, as the CSV importer does
+    row['timestamp'] = _naive_local(timestamp)
+    return row
+
+
+def _insert_readings(session, rows):
+    """Flag, bulk insert and roll up reading rows; returns flagged copies with their ids"""
+    # Copies, so a retried batch (e.g. from the ingest buffer) is not left mutated. Scoring
+    # leaves the detector alone; _on_readings_stored adds the rows once they are committed.
+    rows = [dict(row, anomaly_flags=flags) for row, flags in zip(rows, anomaly_detector.score(rows))]
+    reading_ids = session.scalars(
+        insert(SensorReading).returning(SensorReading.id, sort_by_parameter_order=True), rows
+    ).all()
+    apply_rollups(session, rows)
+    return [dict(row, id=reading_id) for row, reading_id in zip(rows, reading_ids)]
+
+
+def _stream_data(row):
+    """JSON data line of a reading event"""
+    return json.dumps({
+        'id': row['id'],
+        'tank_id': row['tank_id'],
+        'timestamp': row['timestamp'].isoformat(),
+        'ph': row['ph'],
+        'temperature_c': row['temperature_c'],
+        'turbidity_ntu': row['turbidity_ntu'],
+        'anomaly_flags': row['anomaly_flags']
+    })
+
+
+def _on_readings_stored(rows):
+    """Update in-memory state and notify stream subscribers after rows are committed
+
+    Never raises: the rows are already stored, and an error here must not
+    make a caller (or the ingest buffer) retry and insert them again.
+    """
+    try:
+        seeding = _seed_unseen_tanks({row['tank_id'] for row in rows})
+        for row in rows:
+            anomaly_detector.observe(row['tank_id'], row)
+            flags = row['anomaly_flags'].split(',') if row['anomaly_flags'] else ()
+            if row['tank_id'] not in seeding and not HARVEST_SKIP_FLAGS.intersection(flags):
+                harvest_estimator.update(row['tank_id'], row['timestamp'], row['turbidity_ntu'])
+            tank_cache.update_reading(row['tank_id'], {
+                'id': row['id'],
+                'timestamp': row['timestamp'],
+                'ph': row['ph'],
+                'temperature_c': row['temperature_c'],
+                'turbidity_ntu': row['turbidity_ntu'],
+                'anomaly_flags': row['anomaly_flags']
+            })
+            if broadcaster.has_subscribers(row['tank_id']):
+                broadcaster.publish(row['tank_id'], row['id'], format_event(row['id'], _stream_data(row)))
+    except Exception:
+        app.logger.exception('Post-commit update failed for %d stored readings', len(rows))
+
+
+def _store_readings(rows):
+    """Insert a group of reading rows in a single transaction"""
+    session = db.get_session()
+    try:
+        stored = _insert_readings(session, rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    _on_readings_stored(stored)
+
+
+def _hourly_sums(session, tank_ids, since):
+    """(tank_id, bucket_start, <channel>_count, <channel>_sum, ...) per tank and hour since `since`
+
+    Read from the hourly rollups, or aggregated from raw readings while the
+    rollup backfill of an older database file is still pending.
+    """
+    if rollups_backfilled(session):
+        columns = [SensorRollup.tank_id, SensorRollup.bucket_start]
+        for channel in HISTORY_CHANNELS:
+            columns += [getattr(SensorRollup, f'{channel}_count'), getattr(SensorRollup, f'{channel}_sum')]
+        return session.query(*columns)\
+                      .filter(SensorRollup.tank_id.in_(tank_ids))\
+                      .filter(SensorRollup.granularity == 3600)\
+                      .filter(SensorRollup.bucket_start >= bucket_start(since, 3600))\
+                      .order_by(SensorRollup.tank_id, SensorRollup.bucket_start)\
+                      .all()
+
+    hour = _epoch_bucket(SensorReading.timestamp, 3600)
+    columns = [SensorReading.tank_id, func.datetime(hour * 3600, 'unixepoch', type_=DateTime).label('bucket_start')]
+    for channel in HISTORY_CHANNELS:
+        column = getattr(SensorReading, channel)
+        columns += [func.count(column).label(f'{channel}_count'), func.total(column).label(f'{channel}_sum')]
+    return session.query(*columns)\
+                  .filter(SensorReading.tank_id.in_(tank_ids))\
+                  .filter(SensorReading.timestamp >= bucket_start(since, 3600))\
+                  .group_by(SensorReading.tank_id, hour)\
+                  .order_by(SensorReading.tank_id, hour)\
+                  .all()
+
+
+def _load_trends(session, tank_ids):
+    """Recent pH average and turbidity/temperature slopes per tank, from hourly sums"""
+    rows = _hourly_sums(session, tank_ids, datetime.now() - timedelta(hours=TREND_HOURS))
+    return trend_features(pd.DataFrame(rows, columns=['tank_id', 'bucket_start'] + [
+        name for channel in HISTORY_CHANNELS for name in (f'{channel}_count', f'{channel}_sum')]))
+
+
+def _seed_harvest_estimator(session, tank_ids):
+    """Start growth fits for tanks this process has not seen, from recent hourly sums"""
+    tank_ids = [t for t in tank_ids if not harvest_estimator.known(t)]
+    if not tank_ids:
+        return
+    rows = _hourly_sums(session, tank_ids, datetime.now() - timedelta(hours=4 * harvest_estimator.half_life))
+    points = {tank_id: [] for tank_id in tank_ids}
+    for r in rows:
+        if not r.turbidity_ntu_count:
+            continue
+        # Hourly mean at the middle of its hour, weighted by the readings behind it
+        mean = r.turbidity_ntu_sum / r.turbidity_ntu_count
+        points[r.tank_id].append((r.bucket_start + timedelta(minutes=30), mean, r.turbidity_ntu_count))
+    for tank_id, tank_points in points.items():
+        harvest_estimator.seed(tank_id, tank_points)
+
+
+def _seed_unseen_tanks(tank_ids):
+    """Seed the growth fits of tanks this process first meets through an ingest
+
+    Returns the tanks it tried to seed. Their hourly sums already hold the
+    committed rows, so the caller must not fold those rows in again; if the
+    lookup failed the tanks stay unseen and the next ingest retries it.
+    """
+    tank_ids = [t for t in tank_ids if not harvest_estimator.known(t)]
+    if not tank_ids:
+        return set()
+    session = db.get_session()
+    try:
+        _seed_harvest_estimator(session, tank_ids)
+    except Exception:
+        app.logger.exception('Could not seed growth fits for tanks %s', tank_ids)
+    finally:
+        session.close()
+    return set(tank_ids)
+
+
+def _harvest_forecast(tank_id, species):
+    """Predicted time to harvest from the tank's growth fit, or None"""
+    target = species['harvest_turbidity_ntu'] if species else 300  # Default as in _reading_flags
+    return harvest_estimator.estimate(tank_id, target)
+
+
+def _latest_reading_query(session, tank_id):
+    """A tank's readings newest first (take .first() for the latest one)"""
+    return session.query(SensorReading).filter_by(tank_id=tank_id)\
+                  .order_by(desc(SensorReading.timestamp))
+
+
+def _load_tank_state(tank_id):
+    """Tank, species thresholds, latest reading and trends, from the cache or the database
+
+    Returns None if the tank does not exist.
+    """
+    state = tank_cache.get(tank_id)
+    if state is not None:
+        return state
+
+    session = db.get_session()
+    try:
+        tank = session.query(Tank).filter_by(id=tank_id).first()
+        if not tank:
+            return None
+        reading = _latest_reading_query(session, tank_id).first()
+        trends = _load_trends(session, [tank_id]) if reading else None
+        _seed_harvest_estimator(session, [tank_id])
+
+        return tank_cache.put(
+            tank_id,
+            {
+                'id': tank.id,
+                'name': tank.name,
+                'algae_type': tank.algae_type,
+                'volume_liters': tank.volume_liters,
+                'status': tank.status
+            },
+            species_catalog.get(tank.algae_type),
+            {
+                'id': reading.id,
+                'timestamp': reading.timestamp,
+                'ph': reading.ph,
+                'temperature_c': reading.temperature_c,
+                'turbidity_ntu': reading.turbidity_ntu,
+                'anomaly_flags': reading.anomaly_flags
+            } if reading else None,
+            trends.loc[tank_id].to_dict() if trends is not None and tank_id in trends.index else None
+        )
+    finally:
+        session.close()
+
+
+def _reading_flags(reading, species):
+    """(ph_safe, temperature_safe, harvest_ready) for a reading against species thresholds"""
+    if not species:
+        # Default safe ranges if species not found
+        return (7.0 <= reading['ph'] <= 9.0,
+                20.0 <= reading['temperature_c'] <= 30.0,
+                reading['turbidity_ntu'] >= 300)
+    return (species['ph_min'] <= reading['ph'] <= species['ph_max'],
+            species['temp_min_c'] <= reading['temperature_c'] <= species['temp_max_c'],
+            reading['turbidity_ntu'] >= species['harvest_turbidity_ntu'])
+
+
+def _reading_payload(reading, species, forecast=None):
+    """JSON form of a reading with its safety and harvest flags and harvest forecast"""
+    ph_safe, temp_safe, harvest_ready = _reading_flags(reading, species)
+    return {
+        'timestamp': reading['timestamp'].isoformat(),
+        'ph': reading['ph'],
+        'temperature_c': reading['temperature_c'],
+        'turbidity_ntu': reading['turbidity_ntu'],
+        'ph_safe': ph_safe,
+        'temperature_safe': temp_safe,
+        'harvest_ready': harvest_ready,
+        'anomaly_flags': reading.get('anomaly_flags'),
+        'harvest_forecast': forecast
+    }
+
+
+# Optional write-behind buffer: POST /api/sensors/reading is acknowledged with 202
+# and readings are group-committed in the background. Opt-in because it needs a
+# background thread, which not every WSGI host (e.g. PythonAnywhere) allows.
+ingest_buffer = None
+if os.environ.get('ALGAE_INGEST_BUFFER', '0') == '1':
+    ingest_buffer = IngestBuffer(
+        _store_readings,
+        max_size=int(os.environ.get('ALGAE_INGEST_MAX_QUEUE', 10000)),
+        batch_size=int(os.environ.get('ALGAE_INGEST_BATCH_SIZE', 200)),
+        flush_interval=float(os.environ.get('ALGAE_INGEST_FLUSH_INTERVAL', 1.0))
+    )
+    ingest_buffer.start()
+
 
 # ==================== TANK ENDPOINTS ====================
 
@@ -81,7 +465,7 @@ def create_tank():
     session = db.get_session()
     try:
         # Check if species exists
-        species = session.query(AlgaeSpecies).filter_by(name=data['algae_type']).first()
+        species = species_catalog.get(data['algae_type'])
         if not species:
             return jsonify({'success': False, 'error': f'Unknown algae species: {data["algae_type"]}'}), 400
 
@@ -135,6 +519,7 @@ def update_tank(tank_id):
             tank.notes = data['notes']
 
         session.commit()
+        tank_cache.invalidate(tank_id)
 
         result = {
             'id': tank.id,
@@ -163,9 +548,13 @@ def delete_tank(tank_id):
         session.query(SensorReading).filter_by(tank_id=tank_id).delete()
         session.query(CollectionEvent).filter_by(tank_id=tank_id).delete()
         session.query(UserAction).filter_by(tank_id=tank_id).delete()
+        session.query(SensorRollup).filter_by(tank_id=tank_id).delete()
 
         session.delete(tank)
         session.commit()
+        tank_cache.invalidate(tank_id)
+        harvest_estimator.forget(tank_id)
+        anomaly_detector.reset(tank_id)
 
         return jsonify({'success': True, 'message': f'Tank {tank_id} deleted successfully'})
     finally:
@@ -177,43 +566,16 @@ def delete_tank(tank_id):
 @app.route('/api/sensors/current/<int:tank_id>', methods=['GET'])
 def get_current_sensors(tank_id):
     """Get latest sensor readings for tank"""
-    session = db.get_session()
-    try:
-        # Get latest reading
-        reading = session.query(SensorReading).filter_by(tank_id=tank_id)\
-                     .order_by(desc(SensorReading.timestamp)).first()
-
-        if not reading:
-            return jsonify({'success': False, 'error': 'No sensor data found'}), 404
+    state = _load_tank_state(tank_id)
+    if not state:
+        return jsonify({'success': False, 'error': 'Tank not found'}), 404
 
-        # Get tank and species for optimal ranges
-        tank = session.query(Tank).filter_by(id=tank_id).first()
-        if not tank:
-            return jsonify({'success': False, 'error': 'Tank not found'}), 404
+    reading = state.reading
+    if not reading:
+        return jsonify({'success': False, 'error': 'No sensor data found'}), 404
 
-        species = session.query(AlgaeSpecies).filter_by(name=tank.algae_type).first()
-        if not species:
-            # Default safe ranges if species not found
-            ph_safe = 7.0 <= reading.ph <= 9.0
-            temp_safe = 20.0 <= reading.temperature_c <= 30.0
-            harvest_ready = reading.turbidity_ntu >= 300
-        else:
-            ph_safe = species.ph_min <= reading.ph <= species.ph_max
-            temp_safe = species.temp_min_c <= reading.temperature_c <= species.temp_max_c
-            harvest_ready = reading.turbidity_ntu >= species.harvest_turbidity_ntu
-
-        result = {
-            'timestamp': reading.timestamp.isoformat(),
-            'ph': reading.ph,
-            'temperature_c': reading.temperature_c,
-            'turbidity_ntu': reading.turbidity_ntu,
-            'ph_safe': ph_safe,
-            'temperature_safe': temp_safe,
-            'harvest_ready': harvest_ready
-        }
-        return jsonify({'success': True, 'reading': result})
-    finally:
-        session.close()
+    return jsonify({'success': True, 'reading': _reading_payload(reading, state.species,
+                                                                 _harvest_forecast(tank_id, state.species))})
 
 
 @app.route('/api/sensors/reading', methods=['POST'])
@@ -223,28 +585,32 @@ def post_sensor_reading():
     if not data:
         return jsonify({'success': False, 'error': 'No data provided'}), 400
 
-    required_fields = ['tank_id', 'turbidity', 'ph', 'temperature']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
+    try:
+        row = _reading_row(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
     session = db.get_session()
     try:
         # Check if tank exists
-        tank = session.query(Tank).filter_by(id=data['tank_id']).first()
+        tank = session.query(Tank).filter_by(id=row['tank_id']).first()
         if not tank:
             return jsonify({'success': False, 'error': f'Tank {data["tank_id"]} not found'}), 404
 
-        reading = SensorReading(
-            tank_id=data['tank_id'],
-            turbidity_ntu=data['turbidity'],
-            ph=data['ph'],
-            temperature_c=data['temperature']
-        )
-        session.add(reading)
+        if ingest_buffer:
+            try:
+                ingest_buffer.submit(row)
+            except BufferFull as e:
+                response = jsonify({'success': False, 'error': str(e)})
+                response.headers['Retry-After'] = str(ingest_buffer.retry_after())
+                return response, 503
+            return jsonify({'success': True, 'queued': True}), 202
+
+        stored = _insert_readings(session, [row])
         session.commit()
+        _on_readings_stored(stored)
 
-        return jsonify({'success': True, 'reading_id': reading.id})
+        return jsonify({'success': True, 'reading_id': stored[0]['id']})
     except Exception as e:
         session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -252,79 +618,669 @@ def post_sensor_reading():
         session.close()
 
 
+@app.route('/api/sensors/reading/batch', methods=['POST'])
+def post_sensor_readings_batch():
+    """Receive a batch of sensor readings (e.g. flushed from an offline ESP32 buffer)
+
+    Accepts {"readings": [...]} or a bare list; rows may belong to different tanks.
+    Valid rows are stored with one bulk insert and one commit, and the response
+    reports success or failure for every row by its index in the request.
+    """
+    data = request.get_json(silent=True)
+    readings = data.get('readings') if isinstance(data, dict) else data
+    if not readings or not isinstance(readings, list):
+        return jsonify({'success': False, 'error': 'No readings provided'}), 400
+    if len(readings) > MAX_BATCH_READINGS:
+        return jsonify({'success': False, 'error': f'Too many readings (max {MAX_BATCH_READINGS})'}), 413
+
+    results = []
+    rows = []
+    for index, item in enumerate(readings):
+        try:
+            rows.append((index, _reading_row(item)))
+            results.append(None)
+        except ValueError as e:
+            results.append({'index': index, 'success': False, 'error': str(e)})
+
+    session = db.get_session()
+    try:
+        # One lookup for every tank referenced by the batch
+        tank_ids = {row['tank_id'] for _, row in rows}
+        known_tanks = {tid for (tid,) in session.query(Tank.id).filter(Tank.id.in_(tank_ids))}
+
+        valid = []
+        for index, row in rows:
+            if row['tank_id'] in known_tanks:
+                valid.append((index, row))
+            else:
+                results[index] = {'index': index, 'success': False, 'error': f'Tank {row["tank_id"]} not found'}
+
+        if valid:
+            stored = _insert_readings(session, [row for _, row in valid])
+            session.commit()
+            _on_readings_stored(stored)
+            for (index, _), row in zip(valid, stored):
+                results[index] = {'index': index, 'success': True, 'reading_id': row['id']}
+
+        return jsonify({
+            'success': len(valid) == len(readings),
+            'accepted': len(valid),
+            'rejected': len(readings) - len(valid),
+            'results': results
+        })
+    except Exception as e:
+        session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        session.close()
+
+
+def _epoch_bucket(column, bucket_seconds):
+    """SQL epoch bucket number of a timestamp column
+
+    The format and width are inlined rather than bound: bound values become
+    separate placeholders in GROUP BY and ORDER BY, so SQLite cannot tell
+    they are the same expression and sorts the groups a second time.
+    """
+    epoch_seconds = cast(func.strftime(literal_column("'%s'"), column), Integer)
+    return epoch_seconds // literal_column(str(int(bucket_seconds)), Integer)
+
+
+def _bucket_time(bucket, bucket_seconds):
+    """Start time of an epoch bucket number"""
+    return EPOCH + timedelta(seconds=bucket * bucket_seconds)
+
+
+def _bucket_points(rows, bucket_seconds):
+    """Format aggregated (bucket, count, mean/min/max per channel) rows for JSON"""
+    result = []
+    for r in rows:
+        point = {'timestamp': _bucket_time(r.bucket, bucket_seconds).isoformat(), 'count': r.count}
+        for channel in HISTORY_CHANNELS:
+            point[channel] = getattr(r, channel)
+            point[f'{channel}_min'] = getattr(r, f'{channel}_min')
+            point[f'{channel}_max'] = getattr(r, f'{channel}_max')
+        result.append(point)
+    return result
+
+
+@app.route('/api/sensors/stream/<int:tank_id>', methods=['GET'])
+def stream_sensor_readings(tank_id):
+    """Server-Sent Events stream of new readings for a tank
+
+    Event ids are reading ids. A reconnecting client sends Last-Event-ID (or
+    ?last_event_id=) and first receives the stored readings it missed. If
+    more than STREAM_REPLAY_LIMIT are missing, the replay ends with a
+    `truncated` event and the stream closes, so the client reconnects from
+    the last id it got and keeps catching up before going live. Only
+    readings stored by this process are pushed live, and each open stream
+    holds a worker thread, so run it on a threaded or async worker.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid Last-Event-ID'}), 400
+
+    # Subscribe before the replay query so nothing stored in between is lost
+    subscription = broadcaster.subscribe(tank_id)
+    replay = []
+    truncated = False
+    if last_id is not None:
+        session = db.get_session()
+        try:
+            readings = session.query(SensorReading)\
+                          .filter(SensorReading.tank_id == tank_id)\
+                          .filter(SensorReading.id > last_id)\
+                          .order_by(SensorReading.id)\
+                          .limit(STREAM_REPLAY_LIMIT + 1)\
+                          .all()
+            # Live events start where we subscribed: going live after a partial
+            # replay would skip everything between its end and that point
+            truncated = len(readings) > STREAM_REPLAY_LIMIT
+            readings = readings[:STREAM_REPLAY_LIMIT]
+            replay = [format_event(r.id, _stream_data({
+                'id': r.id,
+                'tank_id': r.tank_id,
+                'timestamp': r.timestamp,
+                'ph': r.ph,
+                'temperature_c': r.temperature_c,
+                'turbidity_ntu': r.turbidity_ntu,
+                'anomaly_flags': r.anomaly_flags
+            })) for r in readings]
+            if readings:
+                last_id = readings[-1].id
+        except Exception:
+            # The generator's finally never runs if the response is not built
+            broadcaster.unsubscribe(subscription)
+            raise
+        finally:
+            session.close()
+
+    def generate():
+        sent_id = last_id or 0
+        try:
+            yield f"retry: {STREAM_KEEPALIVE_SECONDS * 1000}\n\n"
+            yield from replay
+            if truncated:
+                yield f"retry: {STREAM_CATCHUP_RETRY_MS}\n\n"
+                yield format_event(sent_id, json.dumps({'replayed': len(replay), 'more': True}), event='truncated')
+                return  # Client reconnects with Last-Event-ID = sent_id
+            while True:
+                try:
+                    event_id, message = subscription.messages.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    if subscription.overflowed:
+                        return  # Client fell behind; it will resume with Last-Event-ID
+                    yield ": keep-alive\n\n"
+                    continue
+                if event_id > sent_id:
+                    sent_id = event_id
+                    yield message
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let a proxy buffer the stream
+    })
+
+
+def _history_format():
+    """History body format: 'json', 'compact', 'arrow' or 'parquet'
+
+    `?format=` wins over the Accept header. Arrow and Parquet fall back to
+    JSON when pyarrow is not installed.
+    """
+    fmt = request.args.get('format')
+    if fmt not in ('json', 'compact', 'arrow', 'parquet'):
+        best = request.accept_mimetypes.best_match(['application/json', ARROW_MIMETYPE, PARQUET_MIMETYPE],
+                                                   default='application/json')
+        fmt = {ARROW_MIMETYPE: 'arrow', PARQUET_MIMETYPE: 'parquet'}.get(best, 'json')
+    if fmt in ('arrow', 'parquet') and pa is None:
+        return 'json'
+    return fmt
+
+
+def _row_columns(rows, names):
+    """Transpose query rows into {name: tuple of values}"""
+    return dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+
+
+def _compact_response(payload):
+    """JSON response for compact history, encoded with orjson when available"""
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, separators=(',', ':'))
+    return app.response_class(body, mimetype='application/json')
+
+
+def _compact_raw(rows):
+    """Raw reading rows as parallel arrays with epoch-millisecond timestamps"""
+    values = _row_columns(rows, RAW_HISTORY_COLUMNS)
+    columns = {'id': values['id'],
+               'timestamp': [(ts - EPOCH) // timedelta(milliseconds=1) for ts in values['timestamp']]}
+    columns.update((channel, values[channel]) for channel in HISTORY_CHANNELS)
+    return columns
+
+
+def _compact_buckets(rows, bucket_seconds):
+    """Aggregated bucket rows as parallel arrays with epoch-millisecond timestamps"""
+    values = _row_columns(rows, BUCKET_HISTORY_COLUMNS)
+    columns = {'timestamp': [b * bucket_seconds * 1000 for b in values['bucket']]}
+    columns.update((name, values[name]) for name in BUCKET_HISTORY_COLUMNS[1:])
+    return columns
+
+
+def _columnar_response(columns, fmt, headers):
+    """Arrow IPC stream or Parquet response from {name: pyarrow array}"""
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    if fmt == 'parquet':
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    headers = {k: str(v) for k, v in headers.items() if v is not None}
+    return Response(sink.getvalue().to_pybytes(),
+                    mimetype=PARQUET_MIMETYPE if fmt == 'parquet' else ARROW_MIMETYPE,
+                    headers=headers)
+
+
+def _raw_columns(rows):
+    """Arrow columns of raw reading rows from _raw_history_query()"""
+    values = _row_columns(rows, RAW_HISTORY_COLUMNS)
+    columns = {
+        'id': pa.array(values['id'], pa.int64()),
+        'timestamp': pa.array(values['timestamp'], pa.timestamp('us'))
+    }
+    for channel in HISTORY_CHANNELS:
+        columns[channel] = pa.array(values[channel], pa.float64())
+    return columns
+
+
+def _bucket_columns(rows, bucket_seconds):
+    """Arrow columns of aggregated bucket rows, laid out like _bucket_points()"""
+    values = _row_columns(rows, BUCKET_HISTORY_COLUMNS)
+    columns = {
+        'timestamp': pa.array([b * bucket_seconds * 1000000 for b in values['bucket']], pa.int64())
+                       .cast(pa.timestamp('us')),
+        'count': pa.array(values['count'], pa.int64())
+    }
+    for name in BUCKET_HISTORY_COLUMNS[2:]:
+        columns[name] = pa.array(values[name], pa.float64())
+    return columns
+
+
+def _parse_cursor(value):
+    """(timestamp, id) from a 'timestamp,id' keyset cursor"""
+    timestamp, reading_id = value.rsplit(',', 1)
+    return _naive_local(datetime.fromisoformat(timestamp)), int(reading_id)
+
+
+def _raw_history_query(session, tank_id, cutoff=None, since=None, after_id=None, cursor=None):
+    """Raw reading rows (id, timestamp, channels) for a tank in (timestamp, id) order"""
+    query = session.query(SensorReading.id, SensorReading.timestamp,
+                          *(getattr(SensorReading, channel) for channel in HISTORY_CHANNELS))\
+                   .filter(SensorReading.tank_id == tank_id)
+    if cutoff:
+        query = query.filter(SensorReading.timestamp >= cutoff)
+    if since:
+        query = query.filter(SensorReading.timestamp > since)
+    if after_id is not None:
+        query = query.filter(SensorReading.id > after_id)
+    if cursor:
+        query = query.filter(tuple_(SensorReading.timestamp, SensorReading.id) > tuple_(*cursor))
+    return query.order_by(SensorReading.timestamp, SensorReading.id)
+
+
+def _history_buckets(session, tank_id, cutoff, bucket_seconds):
+    """Aggregate a tank's raw readings since `cutoff` into fixed time buckets in SQL
+
+    Returns (bucket, count, <channel>, <channel>_min, <channel>_max, ...) rows.
+    """
+    bucket = _epoch_bucket(SensorReading.timestamp, bucket_seconds).label('bucket')
+
+    columns = [bucket, func.count(SensorReading.id).label('count')]
+    for channel in HISTORY_CHANNELS:
+        column = getattr(SensorReading, channel)
+        columns += [
+            func.avg(column).label(channel),
+            func.min(column).label(f'{channel}_min'),
+            func.max(column).label(f'{channel}_max')
+        ]
+
+    return session.query(*columns)\
+                  .filter(SensorReading.tank_id == tank_id)\
+                  .filter(SensorReading.timestamp >= cutoff)\
+                  .group_by(bucket)\
+                  .order_by(bucket)\
+                  .all()
+
+
+def _rollup_history(session, tank_id, cutoff, bucket_seconds, granularity):
+    """Re-aggregate one rollup granularity into `bucket_seconds` buckets in SQL
+
+    Returns rows shaped like _history_buckets().
+    """
+    bucket = _epoch_bucket(SensorRollup.bucket_start, bucket_seconds).label('bucket')
+    total = func.sum(SensorRollup.count)
+
+    columns = [bucket, total.label('count')]
+    for channel in HISTORY_CHANNELS:
+        columns += [
+            # Per-channel count: readings missing this channel must not dilute its mean
+            (func.sum(getattr(SensorRollup, f'{channel}_sum')) /
+             func.sum(getattr(SensorRollup, f'{channel}_count'))).label(channel),
+            func.min(getattr(SensorRollup, f'{channel}_min')).label(f'{channel}_min'),
+            func.max(getattr(SensorRollup, f'{channel}_max')).label(f'{channel}_max')
+        ]
+
+    return session.query(*columns)\
+                  .filter(SensorRollup.tank_id == tank_id)\
+                  .filter(SensorRollup.granularity == granularity)\
+                  .filter(SensorRollup.bucket_start >= bucket_start(cutoff, granularity))\
+                  .group_by(bucket)\
+                  .order_by(bucket)\
+                  .all()
+
+
 @app.route('/api/sensors/history/<int:tank_id>', methods=['GET'])
 def get_sensor_history(tank_id):
-    """Get sensor history for charting"""
+    """Get sensor history for charting
+
+    Query params: `hours` window (default 24). Pass `resolution` (bucket
+    seconds) or `max_points` to get per-bucket mean/min/max instead of raw
+    rows, so the response size depends on the resolution, not the window.
+    Buckets are built from the coarsest rollup no wider than the resolution,
+    falling back to raw readings below one minute (or before the rollups
+    of an older database file are backfilled).
+
+    Incremental fetch: pass the previous response's `next_after_id` as
+    `after_id` to get only rows stored since (raw), or every bucket from the
+    oldest one those rows touched onwards (bucketed). Ids also catch rows
+    stored late with older device timestamps. A bucketed `after_id` from
+    before the oldest stored reading, or too far behind, gets the whole
+    window back. `since` (a timestamp; pass
+    `next_since`) is still accepted but misses such rows.
+
+    Keyset pagination (raw): `limit` rows per page; pass `next_cursor` back
+    as `cursor` for the next page. `next_cursor` is null on the last page.
+
+    Columnar bodies: send `Accept: application/vnd.apache.arrow.stream` (or
+    `application/vnd.apache.parquet`, or `?format=arrow|parquet`) to get the
+    same columns as an Arrow IPC stream / Parquet file; the cursors and
+    resolution are then returned in X-Next-Since, X-Next-After-Id,
+    X-Next-Cursor and X-Resolution-Seconds headers.
+
+    `?format=compact` keeps JSON but sends `readings` as parallel arrays
+    (one per column) with epoch-millisecond timestamps.
+    """
     hours = request.args.get('hours', 24, type=int)
+    resolution = request.args.get('resolution', type=int)
+    max_points = request.args.get('max_points', type=int)
+    after_id = request.args.get('after_id', type=int)
+    since = request.args.get('since')
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+
+    if max_points is not None and max_points < 1:
+        return jsonify({'success': False, 'error': 'max_points must be positive'}), 400
+    if resolution is None and max_points:
+        resolution = math.ceil(hours * 3600 / max_points)
+    if resolution is not None and resolution < 1:
+        return jsonify({'success': False, 'error': 'resolution must be at least 1 second'}), 400
+    if limit is not None and not 1 <= limit <= MAX_HISTORY_PAGE:
+        return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_HISTORY_PAGE}'}), 400
+    try:
+        since = _naive_local(datetime.fromisoformat(since)) if since else None
+    except ValueError:
+        return jsonify({'success': False, 'error': f'Invalid since timestamp: {since}'}), 400
+    try:
+        cursor = _parse_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'success': False, 'error': f'Invalid cursor: {cursor}'}), 400
     
     session = db.get_session()
     try:
-        cutoff = datetime.utcnow() - timedelta(hours=hours)
-        readings = session.query(SensorReading)\
-                      .filter(SensorReading.tank_id == tank_id)\
-                      .filter(SensorReading.timestamp >= cutoff)\
-                      .order_by(SensorReading.timestamp)\
-                      .all()
+        cutoff = datetime.now() - timedelta(hours=hours)  # Readings are stored in naive local time
+        if resolution:
+            # Raw readings until an older file's rollups are backfilled
+            granularity = max((g for g in ROLLUP_GRANULARITIES if g <= resolution), default=None) \
+                if rollups_backfilled(session) else None
+            if granularity:
+                # Whole rollup buckets per point, so point boundaries line up with rollup rows
+                resolution = math.ceil(resolution / granularity) * granularity
+            if since:
+                # Resend the bucket `since` falls in: it may have grown since the last fetch
+                cutoff = max(cutoff, bucket_start(since, resolution))
+            oldest = None
+            if after_id is None:
+                next_after_id = session.scalar(select(func.max(SensorReading.id)))
+            else:
+                first_id, last_id = session.execute(HISTORY_ID_RANGE_SQL).one()
+                if first_id is not None and (after_id < first_id or last_id - after_id > HISTORY_DELTA_MAX_IDS):
+                    # Stale or past retention: send the whole window, which replaces the client's copy
+                    after_id, next_after_id = None, last_id
+                else:
+                    oldest, next_after_id = session.execute(HISTORY_DELTA_SQL,
+                                                            {'tank_id': tank_id, 'after_id': after_id,
+                                                             'cutoff': cutoff}).one()
+                if oldest:
+                    # Resend every bucket from the oldest one the new rows landed in
+                    cutoff = max(cutoff, bucket_start(oldest, resolution))
+            if after_id is not None and not oldest:
+                rows = []  # Nothing new for this tank
+            elif granularity:
+                rows = _rollup_history(session, tank_id, cutoff, resolution, granularity)
+            else:
+                rows = _history_buckets(session, tank_id, cutoff, resolution)
+            next_since = _bucket_time(rows[-1].bucket, resolution).isoformat() if rows else \
+                (since.isoformat() if since else None)
+            next_after_id = next_after_id if next_after_id is not None else after_id
+
+            fmt = _history_format()
+            if fmt in ('arrow', 'parquet'):
+                return _columnar_response(_bucket_columns(rows, resolution), fmt, {
+                    'X-Resolution-Seconds': resolution,
+                    'X-Next-Since': next_since,
+                    'X-Next-After-Id': next_after_id
+                })
+            if fmt == 'compact':
+                return _compact_response({
+                    'success': True,
+                    'format': 'compact',
+                    'resolution_seconds': resolution,
+                    'rollup_seconds': granularity,
+                    'readings': _compact_buckets(rows, resolution),
+                    'next_since': next_since,
+                    'next_after_id': next_after_id
+                })
+            return jsonify({
+                'success': True,
+                'resolution_seconds': resolution,
+                'rollup_seconds': granularity,
+                'readings': _bucket_points(rows, resolution),
+                'next_since': next_since,
+                'next_after_id': next_after_id
+            })
+
+        query = _raw_history_query(session, tank_id, cutoff, since, after_id, cursor)
+        if limit:
+            # One extra row tells whether another page follows
+            readings = query.limit(limit + 1).all()
+            has_more = len(readings) > limit
+            readings = readings[:limit]
+        else:
+            readings = query.all()
+            has_more = False
         
+        next_since = readings[-1].timestamp.isoformat() if readings else (since.isoformat() if since else None)
+        next_after_id = max((r.id for r in readings), default=after_id)
+        next_cursor = f"{next_since},{readings[-1].id}" if has_more else None
+
+        fmt = _history_format()
+        if fmt in ('arrow', 'parquet'):
+            return _columnar_response(_raw_columns(readings), fmt, {
+                'X-Next-Since': next_since,
+                'X-Next-After-Id': next_after_id,
+                'X-Next-Cursor': next_cursor
+            })
+        if fmt == 'compact':
+            return _compact_response({
+                'success': True,
+                'format': 'compact',
+                'readings': _compact_raw(readings),
+                'next_since': next_since,
+                'next_after_id': next_after_id,
+                'next_cursor': next_cursor
+            })
+
         result = [{
+            'id': r.id,
             'timestamp': r.timestamp.isoformat(),
             'ph': r.ph,
             'temperature_c': r.temperature_c,
             'turbidity_ntu': r.turbidity_ntu
         } for r in readings]
         
-        return jsonify({'success': True, 'readings': result})
+        return jsonify({
+            'success': True,
+            'readings': result,
+            'next_since': next_since,
+            'next_after_id': next_after_id,
+            'next_cursor': next_cursor
+        })
     finally:
         session.close()
 
 
-@app.route('/api/sensors/history/<int:tank_id>', methods=['DELETE'])
-def clear_sensor_history(tank_id):
-    """Clear all sensor history for a tank"""
+@app.route('/api/sensors/export/<int:tank_id>', methods=['GET'])
+def export_sensor_history(tank_id):
+    """Stream a tank's raw history (all of it by default) with constant memory
+
+    `format=ndjson` (default) yields one JSON object per line; `format=json`
+    yields the same body as the history endpoint, written in chunks. Rows
+    are read in (timestamp, id) keyset pages of EXPORT_FETCH_SIZE, each in
+    its own short query; `hours` and `cursor` narrow the export.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    hours = request.args.get('hours', type=int)
+    cursor = request.args.get('cursor')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'success': False, 'error': f'Unknown format: {fmt}'}), 400
+    try:
+        cursor = _parse_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'success': False, 'error': f'Invalid cursor: {cursor}'}), 400
+    cutoff = datetime.now() - timedelta(hours=hours) if hours else None  # Same naive local clock as ingest
+
+    def fetch_chunk(after):
+        """Next EXPORT_FETCH_SIZE rows after the (timestamp, id) key, in a short read of its own"""
+        session = db.get_session()
+        try:
+            return _raw_history_query(session, tank_id, cutoff, cursor=after).limit(EXPORT_FETCH_SIZE).all()
+        finally:
+            session.close()
+
+    def generate():
+        # No cursor stays open while the client reads, so slow downloads never hold a lock
+        if fmt == 'json':
+            yield '{"success": true, "readings": ['
+        separator = '\n' if fmt == 'ndjson' else ','
+        first = True
+        after = cursor
+        while True:
+            chunk = fetch_chunk(after)
+            if not chunk:
+                break
+            after = (chunk[-1].timestamp, chunk[-1].id)
+            lines = [json.dumps({
+                'id': r.id,
+                'timestamp': r.timestamp.isoformat(),
+                'ph': r.ph,
+                'temperature_c': r.temperature_c,
+                'turbidity_ntu': r.turbidity_ntu
+            }) for r in chunk]
+            body = separator.join(lines)
+            if fmt == 'ndjson':
+                yield body + '\n'
+            else:
+                yield body if first else ',' + body
+            first = False
+            if len(chunk) < EXPORT_FETCH_SIZE:
+                break
+        if fmt == 'json':
+            yield ']}'
+
+    extension = 'ndjson' if fmt == 'ndjson' else 'json'
+    return Response(generate(), mimetype='application/x-ndjson' if fmt == 'ndjson' else 'application/json',
+                    headers={'Content-Disposition': f'attachment; filename=tank_{tank_id}_history.{extension}'})
+
+
+def _anomalies_query(tank_id, cutoff, limit):
+    """Up to `limit` flagged readings of a tank since `cutoff`, newest first"""
+    return select(SensorReading.id, SensorReading.timestamp, SensorReading.ph, SensorReading.temperature_c,
+                  SensorReading.turbidity_ntu, SensorReading.anomaly_flags)\
+        .where(SensorReading.tank_id == tank_id,
+               SensorReading.anomaly_flags.isnot(None),
+               SensorReading.timestamp >= cutoff)\
+        .order_by(desc(SensorReading.timestamp))\
+        .limit(limit)
+
+
+@app.route('/api/sensors/anomalies/<int:tank_id>', methods=['GET'])
+def get_sensor_anomalies(tank_id):
+    """Flagged readings for a tank, newest first
+
+    Query params: hours (default 24), limit (default 100, max 1000).
+    Flags are 'channel:kind' pairs; kind is spike, stuck or range.
+    """
+    hours = request.args.get('hours', 24, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    if limit < 1:
+        return jsonify({'success': False, 'error': 'limit must be positive'}), 400
+    limit = min(limit, MAX_ANOMALIES)
+    cutoff = datetime.now() - timedelta(hours=hours)  # Readings are stored in naive local time
+
     session = db.get_session()
     try:
-        deleted_count = session.query(SensorReading).filter_by(tank_id=tank_id).delete()
-        session.commit()
+        rows = session.execute(_anomalies_query(tank_id, cutoff, limit)).all()
+
+        counts = {}
+        anomalies = []
+        for r in rows:
+            flags = r.anomaly_flags.split(',')
+            for flag in flags:
+                counts[flag] = counts.get(flag, 0) + 1
+            anomalies.append({
+                'id': r.id,
+                'timestamp': r.timestamp.isoformat(),
+                'ph': r.ph,
+                'temperature_c': r.temperature_c,
+                'turbidity_ntu': r.turbidity_ntu,
+                'flags': flags
+            })
+
         return jsonify({
-            'success': True, 
-            'message': f'Deleted {deleted_count} sensor readings for tank {tank_id}'
+            'success': True,
+            'tank_id': tank_id,
+            'count': len(anomalies),
+            'counts': counts,
+            'anomalies': anomalies
         })
     finally:
         session.close()
 
 
+@app.route('/api/sensors/history/<int:tank_id>', methods=['DELETE'])
+def clear_sensor_history(tank_id):
+    """Clear all sensor history for a tank (in small batches to keep the writer lock short)"""
+    deleted_count = db.delete_in_batches(SensorReading, SensorReading.tank_id == tank_id)
+    db.delete_in_batches(SensorRollup, SensorRollup.tank_id == tank_id)
+    tank_cache.invalidate(tank_id)
+    harvest_estimator.reset(tank_id)
+    anomaly_detector.reset(tank_id)
+    return jsonify({
+        'success': True, 
+        'message': f'Deleted {deleted_count} sensor readings for tank {tank_id}'
+    })
+
+
 # ==================== COLLECTION ENDPOINTS ====================
 
 @app.route('/api/collection/start/<int:tank_id>', methods=['POST'])
 def start_collection(tank_id):
     """Start algae collection process"""
-    session = db.get_session()
-    try:
-        tank = session.query(Tank).filter_by(id=tank_id).first()
-        if not tank:
-            return jsonify({'success': False, 'error': 'Tank not found'}), 404
+    state = _load_tank_state(tank_id)
+    if not state:
+        return jsonify({'success': False, 'error': 'Tank not found'}), 404
 
-        # Get latest sensor reading for turbidity
-        reading = session.query(SensorReading).filter_by(tank_id=tank_id)\
-                     .order_by(desc(SensorReading.timestamp)).first()
+    # Latest sensor reading for turbidity
+    reading = state.reading
+    if not reading:
+        return jsonify({'success': False, 'error': 'No sensor data available'}), 400
 
-        if not reading:
-            return jsonify({'success': False, 'error': 'No sensor data available'}), 400
+    estimated_yield = reading['turbidity_ntu'] * state.tank['volume_liters'] * 0.1  # Rough estimate
 
+    session = db.get_session()
+    try:
         # Create collection event
         event = CollectionEvent(
             tank_id=tank_id,
-            turbidity_before=reading.turbidity_ntu,
-            estimated_yield_grams=reading.turbidity_ntu * tank.volume_liters * 0.1  # Rough estimate
+            turbidity_before=reading['turbidity_ntu']
         )
         session.add(event)
         session.commit()
+        harvest_estimator.reset(tank_id)  # Regrowth starts from the post-harvest turbidity
+        anomaly_detector.reset(tank_id)  # So the harvest drop is not flagged as a spike
 
         return jsonify({
             'success': True,
             'event_id': event.id,
             'message': f'Collection started for tank {tank_id}',
-            'estimated_yield': event.estimated_yield_grams
+            'estimated_yield': estimated_yield
         })
     finally:
         session.close()
@@ -332,29 +1288,40 @@ def start_collection(tank_id):
 
 # ==================== SPECIES ENDPOINTS ====================
 
+# Serialized /api/species body for the current catalogue version: (etag, body)
+_species_body = (None, None)
+
+
 @app.route('/api/species', methods=['GET'])
 def get_species():
-    """Get all available algae species"""
-    session = db.get_session()
-    try:
-        species = session.query(AlgaeSpecies).all()
+    """Get all available algae species (ETag, 304 on If-None-Match)"""
+    global _species_body
+    catalog = species_catalog.current()
+    etag, body = _species_body
+    if etag != catalog.etag:
         result = [{
-            'id': s.id,
-            'name': s.name,
-            'scientific_name': s.scientific_name,
-            'ph_range': f"{s.ph_min}-{s.ph_max}",
-            'ph_optimal': s.ph_optimal,
-            'temp_range': f"{s.temp_min_c}-{s.temp_max_c}",
-            'temp_optimal': s.temp_optimal_c,
-            'harvest_turbidity': s.harvest_turbidity_ntu,
-            'growth_days': s.growth_rate_days,
-            'description': s.description,
-            'uses': s.uses,
-            'difficulty': s.difficulty
-        } for s in species]
-        return jsonify({'success': True, 'species': result})
-    finally:
-        session.close()
+            'id': s['id'],
+            'name': s['name'],
+            'scientific_name': s['scientific_name'],
+            'ph_range': f"{s['ph_min']}-{s['ph_max']}",
+            'ph_optimal': s['ph_optimal'],
+            'temp_range': f"{s['temp_min_c']}-{s['temp_max_c']}",
+            'temp_optimal': s['temp_optimal_c'],
+            'harvest_turbidity': s['harvest_turbidity_ntu'],
+            'growth_days': s['growth_rate_days'],
+            'description': s['description'],
+            'uses': s['uses'],
+            'difficulty': s['difficulty']
+        } for s in catalog.species]
+        etag, body = catalog.etag, jsonify({'success': True, 'species': result}).get_data()
+        _species_body = (etag, body)
+
+    response = app.response_class(body, mimetype='application/json')
+    # Weak from the start: the compressor would weaken it on a gzip 200 but not
+    # on a 304, and make_conditional compares weakly, so W/"x" and "x" both match
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'  # Clients may store it but must revalidate
+    return response.make_conditional(request)
 
 
 # ==================== RECOMMENDATIONS ====================
@@ -362,103 +1329,204 @@ def get_species():
 @app.route('/api/recommendations/<int:tank_id>', methods=['GET'])
 def get_recommendations(tank_id):
     """Get maintenance recommendations for tank"""
-    session = db.get_session()
-    try:
-        # Get tank and latest sensor data
-        tank = session.query(Tank).filter_by(id=tank_id).first()
-        if not tank:
-            return jsonify({'success': False, 'error': 'Tank not found'}), 404
+    # Get tank and latest sensor data
+    state = _load_tank_state(tank_id)
+    if not state:
+        return jsonify({'success': False, 'error': 'Tank not found'}), 404
 
-        reading = session.query(SensorReading).filter_by(tank_id=tank_id)\
-                     .order_by(desc(SensorReading.timestamp)).first()
+    reading = state.reading
+    if not reading:
+        return jsonify({'success': False, 'error': 'No sensor data available'}), 404
 
-        if not reading:
-            return jsonify({'success': False, 'error': 'No sensor data available'}), 404
+    # Get species optimal values
+    species = state.species
+    if not species:
+        return jsonify({'success': False, 'error': 'Species data not found'}), 404
 
-        # Get species optimal values
-        species = session.query(AlgaeSpecies).filter_by(name=tank.algae_type).first()
-        if not species:
-            return jsonify({'success': False, 'error': 'Species data not found'}), 404
+    # Same rule table as the bulk endpoint, over a one-tank frame
+    row = dict(reading, **{column: species[column] for column in THRESHOLD_COLUMNS}, **(state.trends or {}))
+    recommendations = recommend(pd.DataFrame([row]))[0]
 
-        # Generate recommendations
-        recommendations = []
+    return jsonify({
+        'success': True,
+        'tank_id': tank_id,
+        'species': state.tank['algae_type'],
+        'recommendations': recommendations,
+        'last_reading': {
+            'turbidity': reading['turbidity_ntu'],
+            'ph': reading['ph'],
+            'temperature': reading['temperature_c'],
+            'timestamp': reading['timestamp'].isoformat()
+        }
+    })
 
-        # pH check
-        if reading.ph_level < species.ph_optimal - 0.5:
-            recommendations.append({
-                'type': 'warning',
-                'message': f'pH too low ({reading.ph_level:.2f}). Target: {species.ph_optimal:.1f}',
-                'action': 'Add CO2 or increase aeration'
-            })
-        elif reading.ph_level > species.ph_optimal + 0.5:
-            recommendations.append({
-                'type': 'warning',
-                'message': f'pH too high ({reading.ph_level:.2f}). Target: {species.ph_optimal:.1f}',
-                'action': 'Add acid or reduce CO2'
-            })
-        else:
-            recommendations.append({
-                'type': 'good',
-                'message': f'pH optimal ({reading.ph_level:.2f})',
-                'action': 'Keep current conditions'
-            })
 
-        # Temperature check
-        if reading.temperature_c < species.temp_optimal_c - 2:
-            recommendations.append({
-                'type': 'warning',
-                'message': f'Temperature too low ({reading.temperature_c:.1f}°C). Target: {species.temp_optimal_c:.1f}°C',
-                'action': 'Increase heating'
-            })
-        elif reading.temperature_c > species.temp_optimal_c + 2:
-            recommendations.append({
-                'type': 'warning',
-                'message': f'Temperature too high ({reading.temperature_c:.1f}°C). Target: {species.temp_optimal_c:.1f}°C',
-                'action': 'Add cooling or reduce light'
-            })
-        else:
-            recommendations.append({
-                'type': 'good',
-                'message': f'Temperature optimal ({reading.temperature_c:.1f}°C)',
-                'action': 'Maintain current temperature'
-            })
+def _latest_readings_query(session):
+    """(Tank, latest SensorReading or None) for every tank, as a single query
+
+    Each tank is joined to its newest reading through a correlated lookup
+    that seeks the (tank_id, timestamp) index.
+    """
+    latest_id = session.query(SensorReading.id)\
+                       .filter(SensorReading.tank_id == Tank.id)\
+                       .order_by(desc(SensorReading.timestamp))\
+                       .limit(1)\
+                       .correlate(Tank)\
+                       .scalar_subquery()
+    return session.query(Tank, SensorReading)\
+                  .outerjoin(SensorReading, SensorReading.id == latest_id)
+
+
+@app.route('/api/recommendations', methods=['GET'])
+def get_bulk_recommendations():
+    """Recommendations for many tanks in one pass
+
+    Optional filters: `status`, `species` (algae type) and `tank_ids`
+    (comma separated). One query loads every tank's latest reading, one
+    more their hourly trends, and the rule table is evaluated over all
+    tanks at once.
+    """
+    status = request.args.get('status')
+    species_name = request.args.get('species')
+    try:
+        tank_ids = [int(t) for t in request.args['tank_ids'].split(',')] if request.args.get('tank_ids') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'tank_ids must be comma separated integers'}), 400
 
-        # Turbidity check
-        if reading.turbidity_ntu > species.turbidity_harvest_ntu:
-            recommendations.append({
-                'type': 'action',
-                'message': f'Ready for harvest! Turbidity: {reading.turbidity_ntu:.1f} NTU (Target: {species.turbidity_harvest_ntu:.1f})',
-                'action': 'Start collection process'
-            })
-        elif reading.turbidity_ntu > species.turbidity_harvest_ntu * 0.8:
-            recommendations.append({
-                'type': 'info',
-                'message': f'Approaching harvest turbidity ({reading.turbidity_ntu:.1f}/{species.turbidity_harvest_ntu:.1f} NTU)',
-                'action': 'Monitor closely'
-            })
-        else:
-            recommendations.append({
-                'type': 'info',
-                'message': f'Growing well ({reading.turbidity_ntu:.1f} NTU)',
-                'action': 'Continue normal operation'
-            })
+    session = db.get_session()
+    try:
+        query = _latest_readings_query(session)
+        if status:
+            query = query.filter(Tank.status == status)
+        if species_name:
+            query = query.filter(Tank.algae_type == species_name)
+        if tank_ids is not None:
+            query = query.filter(Tank.id.in_(tank_ids))
+
+        tanks = []
+        rows = []
+        for tank, reading in query.order_by(Tank.id):
+            entry = {'tank_id': tank.id, 'name': tank.name, 'species': tank.algae_type, 'recommendations': []}
+            tanks.append(entry)
+            species = species_catalog.get(tank.algae_type)
+            if not reading:
+                entry['error'] = 'No sensor data available'
+            elif not species:
+                entry['error'] = 'Species data not found'
+            else:
+                entry['last_reading'] = {
+                    'turbidity': reading.turbidity_ntu,
+                    'ph': reading.ph,
+                    'temperature': reading.temperature_c,
+                    'timestamp': reading.timestamp.isoformat()
+                }
+                rows.append(dict({column: species[column] for column in THRESHOLD_COLUMNS},
+                                 tank_id=tank.id, ph=reading.ph, temperature_c=reading.temperature_c,
+                                 turbidity_ntu=reading.turbidity_ntu))
+
+        if rows:
+            frame = pd.DataFrame(rows)
+            frame = frame.join(_load_trends(session, frame['tank_id'].tolist()), on='tank_id')
+            by_id = {entry['tank_id']: entry for entry in tanks}
+            for tank_id, advice in zip(frame['tank_id'], recommend(frame)):
+                by_id[tank_id]['recommendations'] = advice
 
         return jsonify({
             'success': True,
-            'tank_id': tank_id,
-            'species': tank.algae_type,
-            'recommendations': recommendations,
-            'last_reading': {
-                'turbidity': reading.turbidity_ntu,
-                'ph': reading.ph_level,
-                'temperature': reading.temperature_c,
-                'timestamp': reading.timestamp.isoformat()
+            'count': len(tanks),
+            'tanks': tanks
+        })
+    finally:
+        session.close()
+
+
+# ==================== FLEET ====================
+
+@app.route('/api/fleet/snapshot', methods=['GET'])
+def get_fleet_snapshot():
+    """Every tank with its latest reading, safety flags and harvest forecast
+
+    Optional filters: `status` and `species` (algae type). Runs a single
+    query (see _latest_readings_query), plus one to seed harvest forecasts
+    for tanks this process has not seen yet.
+    """
+    status = request.args.get('status')
+    species_name = request.args.get('species')
+
+    session = db.get_session()
+    try:
+        query = _latest_readings_query(session)
+        if status:
+            query = query.filter(Tank.status == status)
+        if species_name:
+            query = query.filter(Tank.algae_type == species_name)
+
+        results = query.order_by(Tank.id).all()
+        _seed_harvest_estimator(session, [tank.id for tank, reading in results if reading])
+
+        tanks = []
+        for tank, reading in results:
+            entry = {
+                'id': tank.id,
+                'name': tank.name,
+                'algae_type': tank.algae_type,
+                'volume_liters': tank.volume_liters,
+                'status': tank.status,
+                'reading': None
             }
+            if reading:
+                species = species_catalog.get(tank.algae_type)
+                entry['reading'] = _reading_payload({
+                    'timestamp': reading.timestamp,
+                    'ph': reading.ph,
+                    'temperature_c': reading.temperature_c,
+                    'turbidity_ntu': reading.turbidity_ntu,
+                    'anomaly_flags': reading.anomaly_flags
+                }, species, _harvest_forecast(tank.id, species))
+            tanks.append(entry)
+
+        return jsonify({
+            'success': True,
+            'count': len(tanks),
+            'harvest_ready': sum(1 for t in tanks if t['reading'] and t['reading']['harvest_ready']),
+            'tanks': tanks
         })
     finally:
         session.close()
 
 
+# ==================== INGEST STATS ====================
+
+@app.route('/api/ingest/stats', methods=['GET'])
+def get_ingest_stats():
+    """Write-behind buffer queue depth and flush latency"""
+    if not ingest_buffer:
+        return jsonify({'success': True, 'enabled': False})
+    return jsonify({'success': True, 'enabled': True, 'stats': ingest_buffer.stats()})
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit ratios of the in-process caches"""
+    return jsonify({
+        'success': True,
+        'tank_state': tank_cache.stats(),
+        'species_catalog': species_catalog.stats(),
+        'stream': broadcaster.stats(),
+        'compression': compressor.stats(),
+        'harvest_estimator': harvest_estimator.stats(),
+        'anomaly_detector': anomaly_detector.stats()
+    })
+
+
+# ==================== RESPONSE COMPRESSION ====================
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli-encode large buffered responses the client accepts compressed"""
+    return compressor.apply(response, request.accept_encodings)
+
+
 # ==================== HEALTH CHECK ====================
 
 @app.route('/api/health', methods=['GET'])
@@ -481,9 +1549,17 @@ def api_docs():
         'endpoints': {
             'tanks': '/api/tanks',
             'sensors': '/api/sensors/current/<tank_id>',
+            'sensor_batch': '/api/sensors/reading/batch',
+            'fleet': '/api/fleet/snapshot',
+            'stream': '/api/sensors/stream/<tank_id>',
+            'anomalies': '/api/sensors/anomalies/<tank_id>',
+            'export': '/api/sensors/export/<tank_id>',
             'collection': '/api/collection/start/<tank_id>',
             'species': '/api/species',
             'recommendations': '/api/recommendations/<tank_id>',
+            'recommendations_bulk': '/api/recommendations',
+            'ingest_stats': '/api/ingest/stats',
+            'cache_stats': '/api/cache/stats',
             'health': '/api/health'
         }
     })
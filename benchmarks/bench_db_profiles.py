@@ -0,0 +1,96 @@
+"""
+Benchmark: SQLite read/write concurrency per Database engine profile
+Runs writer and reader processes (like gunicorn workers) against a scratch
+database and reports throughput and lock errors for each profile.
+
+Usage: python benchmarks/bench_db_profiles.py [--seconds 5] [--writers 2] [--readers 4]
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import desc
+from sqlalchemy.exc import OperationalError
+from database import Database, Tank, SensorReading, ENGINE_PROFILES
+
+
+def _worker(kind, db_url, profile, seconds, results):
+    database = Database(db_url, profile=profile)
+    ops = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        session = database.get_session()
+        start = time.perf_counter()
+        try:
+            if kind == 'write':
+                session.add(SensorReading(tank_id=1, ph=8.0, temperature_c=30.0, turbidity_ntu=100.0))
+                session.commit()
+            else:
+                session.query(SensorReading).filter_by(tank_id=1)\
+                       .order_by(desc(SensorReading.timestamp)).first()
+            ops += 1
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            session.rollback()
+            errors += 1
+        finally:
+            session.close()
+    database.close()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    results.put((kind, ops, errors, p99))
+
+
+def run_profile(profile, seconds, writers, readers):
+    """Run one profile against a fresh database file; returns aggregated stats"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        database = Database(db_url, profile=profile)
+        database.init_db()
+        session = database.get_session()
+        session.add(Tank(name='Bench', algae_type='Spirulina', volume_liters=100))
+        session.commit()
+        session.close()
+        database.close()
+
+        results = mp.Queue()
+        procs = [mp.Process(target=_worker, args=('write', db_url, profile, seconds, results)) for _ in range(writers)]
+        procs += [mp.Process(target=_worker, args=('read', db_url, profile, seconds, results)) for _ in range(readers)]
+        for p in procs:
+            p.start()
+        stats = {'write': [0, 0, 0.0], 'read': [0, 0, 0.0]}
+        for _ in procs:
+            kind, ops, errors, p99 = results.get()
+            stats[kind][0] += ops
+            stats[kind][1] += errors
+            stats[kind][2] = max(stats[kind][2], p99)
+        for p in procs:
+            p.join()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers + {args.readers} readers, {args.seconds:g}s per profile\n")
+    print(f"{'profile':<12}{'writes/s':>10}{'w-err':>7}{'w-p99ms':>9}{'reads/s':>10}{'r-err':>7}{'r-p99ms':>9}")
+    for profile in ENGINE_PROFILES:
+        stats = run_profile(profile, args.seconds, args.writers, args.readers)
+        w, r = stats['write'], stats['read']
+        print(f"{profile:<12}{w[0] / args.seconds:>10.0f}{w[1]:>7}{w[2]:>9.1f}"
+              f"{r[0] / args.seconds:>10.0f}{r[1]:>7}{r[2]:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: DynamoDB history items to a typed DataFrame
+Compares the old blank.py path (boto3 resource deserialization to Decimal,
+recursive convert_decimals, DataFrame, pd.to_numeric per column) with
+HistoryReader's one-pass column build from low-level items.
+
+Usage: python benchmarks/bench_dynamo_decode.py [--items 500] [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from boto3.dynamodb.types import TypeDeserializer
+
+from dynamo_history import HistoryReader
+
+
+def low_level_items(count):
+    """Items as a low-level query returns them (numbers are strings under 'N')"""
+    return [{
+        'device_id': {'S': 'ESP32_Tank_001'},
+        'timestamp': {'N': str(1000 * i)},
+        'temperature': {'N': f"{24 + i % 30 / 10:.1f}"},
+        'ph': {'N': f"{7 + i % 100 / 100:.2f}"},
+        'turbidity_ntu': {'N': f"{100 + i % 400 / 3:.3f}"},
+        'salinity': {'N': '1.2'}
+    } for i in range(count)]
+
+
+def convert_decimals(obj):
+    """blank.py's original recursive walk"""
+    if isinstance(obj, list):
+        return [convert_decimals(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_decimals(v) for k, v in obj.items()}
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+
+def old_path(items):
+    # What table.query() on a boto3 resource does to every attribute first
+    deserializer = TypeDeserializer()
+    resource_items = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in items]
+    df = pd.DataFrame(convert_decimals(resource_items))
+    df['timestamp'] = pd.to_numeric(df['timestamp'])
+    df = df.sort_values('timestamp')
+    for col in ['temperature', 'ph', 'turbidity_ntu']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    items = low_level_items(args.items)
+    reader = HistoryReader(client=None, table_name='TankSensorData')
+
+    old = old_path(items)
+    new = reader._frame(items)
+    for col in reader.attributes:
+        assert np.allclose(old[col].to_numpy(dtype=float), new[col].to_numpy(dtype=float)), col
+
+    results = {}
+    for name, fn in [('recursive walk + to_numeric', lambda: old_path(items)),
+                     ('column arrays (HistoryReader)', lambda: reader._frame(items))]:
+        best = min(timeit.repeat(fn, number=args.repeat, repeat=5)) / args.repeat
+        results[name] = best
+        print(f"{name:<32} {best * 1000:8.3f} ms / {args.items} items")
+    old_ms, new_ms = results.values()
+    print(f"speedup: {old_ms / new_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: bytes on the wire and encode time for sensor history responses
+Seeds a scratch database with 10-second readings, then requests 24 h and 7 d
+of history (raw and downsampled) through the Flask test client in each body
+format and content encoding.
+
+Usage: python benchmarks/bench_history_encoding.py [--repeat 5] [--interval 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+import database
+from database import Database, Tank, SensorReading
+
+FORMATS = ['json', 'compact', 'arrow']
+ENCODINGS = ['identity', 'gzip', 'br']
+
+
+def seed(target, days, interval):
+    session = target.get_session()
+    session.add(Tank(name='Bench Tank', algae_type='Spirulina', volume_liters=100))
+    session.commit()
+    now = datetime.utcnow()
+    count = days * 86400 // interval
+    rows = [{'tank_id': 1, 'timestamp': now - timedelta(seconds=interval * i),
+             'ph': round(8.5 + (i % 97) / 100, 2), 'temperature_c': round(30 + (i % 53) / 10, 1),
+             'turbidity_ntu': float(100 + i % 400)}
+            for i in range(count)]
+    for start in range(0, count, 10000):
+        session.execute(insert(SensorReading), rows[start:start + 10000])
+    session.commit()
+    session.close()
+    target.rebuild_rollups()
+    return count
+
+
+def measure(client, url, encoding, repeat):
+    """(bytes on the wire, median request ms) for one history request"""
+    headers = {} if encoding == 'identity' else {'Accept-Encoding': encoding}
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+    assert response.status_code == 200, response.status_code
+    assert response.headers.get('Content-Encoding', 'identity') == encoding or len(response.data) < 1024
+    return len(response.data), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--interval', type=int, default=10, help='Seconds between seeded readings')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app binds the module-level database on import
+        database.db = Database(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        import app_pythonanywhere as api
+
+        print(f"Seeded {seed(database.db, days=7, interval=args.interval):,} readings "
+              f"(brotli {'on' if 'br' in api.compressor.encodings else 'unavailable'}, "
+              f"orjson {'on' if api.orjson else 'unavailable'})")
+        client = api.app.test_client()
+
+        print(f"{'window':<7} {'query':<15} {'format':<8} "
+              + ' '.join(f"{e + ' bytes':>14} {'ms':>7}" for e in ENCODINGS))
+        for hours, window in [(24, '24h'), (168, '7d')]:
+            for query in ['raw', 'max_points=500']:
+                for fmt in FORMATS:
+                    if fmt == 'arrow' and api.pa is None:
+                        continue
+                    url = f"/api/sensors/history/1?hours={hours}&format={fmt}"
+                    if query != 'raw':
+                        url += f"&{query}"
+                    cells = []
+                    for encoding in ENCODINGS:
+                        if encoding == 'br' and 'br' not in api.compressor.encodings:
+                            cells.append(f"{'-':>14} {'-':>7}")
+                            continue
+                        size, ms = measure(client, url, encoding, args.repeat)
+                        cells.append(f"{size:>14,} {ms:>7.1f}")
+                    print(f"{window:<7} {query:<15} {fmt:<8} " + ' '.join(cells))
+
+        database.db.close()
+
+
+if __name__ == '__main__':
+    main()
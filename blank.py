@@ -2,9 +2,9 @@ import os
 import base64
 import streamlit as st
 import boto3
-from boto3.dynamodb.conditions import Key
 import pandas as pd
-from decimal import Decimal
+from dynamo_history import HistoryReader
+from dynamo_fleet import FleetReader, LATEST_TABLE_NAME
 
 # ---------- 从 Streamlit Secrets 读取 AWS 凭证 ----------
 # 注意：必须在部署时在 Streamlit Cloud 的 Secrets 中添加以下键值对
@@ -20,9 +20,26 @@ os.environ['AWS_DEFAULT_REGION'] = AWS_DEFAULT_REGION
 # ---------- AWS 配置 ----------
 REGION = AWS_DEFAULT_REGION
 TABLE_NAME = "TankSensorData"
+# 最新值表（每个设备一条，由写入端维护）缺失时才用到的设备列表
+TANK_IDS = list(st.secrets.get("TANK_IDS", ["ESP32_Tank_001"]))
 
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-table = dynamodb.Table(TABLE_NAME)
+
+@st.cache_resource
+def get_history_reader():
+    # 低级 client 可在线程间共享，供并行分段查询使用
+    return HistoryReader(boto3.client('dynamodb', region_name=REGION), TABLE_NAME)
+
+
+@st.cache_resource
+def get_fleet_reader():
+    history = get_history_reader()
+    return FleetReader(history.client, history, table_name=LATEST_TABLE_NAME)
+
+
+@st.cache_data(ttl=10)
+def get_overview():
+    # 一次 Scan 取回全部设备的最新读数（设备自动发现）
+    return get_fleet_reader().overview(TANK_IDS)
 
 def get_query_param(name, default=None):
     value = st.query_params.get(name, default)
@@ -85,39 +102,36 @@ if get_query_param('started') is None:
     show_cover_and_stop()
 
 # ---------- 工具函数 ----------
-def convert_decimals(obj):
-    if isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    return obj
-
 def get_latest(device_id):
-    resp = table.query(
-        KeyConditionExpression=Key('device_id').eq(device_id),
-        Limit=1,
-        ScanIndexForward=False
-    )
-    items = resp.get('Items', [])
-    return convert_decimals(items[0]) if items else None
+    # 低级 client 返回的数字直接解析为 float，无需逐层转换 Decimal
+    return get_history_reader().latest(device_id)
 
 def get_last_n(device_id, n=100):
-    resp = table.query(
-        KeyConditionExpression=Key('device_id').eq(device_id),
-        Limit=n,
-        ScanIndexForward=False
-    )
-    items = resp.get('Items', [])
-    items.reverse()
-    return convert_decimals(items)
+    # 自动翻页（不会在 1 MB 处截断），只取图表需要的字段
+    return get_history_reader().last_n(device_id, n)
 
 # ---------- 界面 ----------
 st.title("🌿 Algae Box Monitor")
+
+# ---------- 全部 Tank 概览 ----------
+overview = get_overview()
+st.subheader(f"🗂️ 全部 Tank 概览（{len(overview)} 个）")
+if len(overview):
+    st.dataframe(overview.rename(columns={
+        'device_id': 'Tank', 'temperature': '温度 °C', 'ph': 'pH',
+        'turbidity_ntu': '浊度 NTU', 'salinity': '盐度 ppt', 'timestamp': '运行毫秒数'
+    }), hide_index=True, use_container_width=True)
+else:
+    st.info("📭 暂无设备上报数据。")
+
+st.markdown("---")
 st.caption(f"当前监控 Tank: **{tank_id}**")
 
-latest = get_latest(tank_id)
+row = overview[overview['device_id'] == tank_id]
+if len(row):
+    latest = {k: v for k, v in row.iloc[0].items() if pd.notna(v)}
+else:
+    latest = get_latest(tank_id)
 if latest:
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("🌡️ 温度", f"{latest.get('temperature', 'N/A')} °C")
@@ -133,17 +147,13 @@ st.markdown("---")
 # ---------- 历史趋势 ----------
 st.subheader("📈 历史趋势")
 
+# 排序键是设备运行毫秒数，重启后从 0 重新计数，不同次开机的数据在键上相互交错，
+# 无法按"最近 N 小时"切出当前这次开机，所以只提供"最近 N 条"
 n_points = st.slider("显示最近多少条记录", min_value=10, max_value=500, value=100, step=10)
+df = get_last_n(tank_id, n=n_points)
 
-history = get_last_n(tank_id, n=n_points)
-if len(history) > 1:
-    df = pd.DataFrame(history)
-    df['timestamp'] = pd.to_numeric(df['timestamp'])
-    df = df.sort_values('timestamp')
-    for col in ['temperature', 'ph', 'turbidity_ntu']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
+# df 已按 timestamp 升序，数值列为 float64
+if len(df) > 1:
     st.markdown("**温度变化**")
     st.line_chart(df.set_index('timestamp')['temperature'])
 
@@ -153,10 +163,12 @@ if len(history) > 1:
     st.markdown("**浊度变化**")
     st.line_chart(df.set_index('timestamp')['turbidity_ntu'])
 else:
-    st.info(f"📭 历史数据不足（当前 {len(history)} 条），请等待更多采样点。")
+    st.info(f"📭 历史数据不足（当前 {len(df)} 条），请等待更多采样点。")
 
 # ---------- 设备切换 ----------
-tank_list = ["ESP32_Tank_001"]   # 可扩展
+tank_list = list(overview['device_id']) or list(TANK_IDS)
+if tank_id not in tank_list:
+    tank_list.append(tank_id)
 selected = st.selectbox("🔄 切换 Tank", tank_list,
                         index=tank_list.index(tank_id) if tank_id in tank_list else 0)
 if selected != tank_id:
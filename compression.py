@@ -0,0 +1,80 @@
+"""
+HTTP response compression for the Algae Box API
+Negotiates brotli (when installed) or gzip from the client's Accept-Encoding
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies that are already compressed, or must reach the client unbuffered
+INCOMPRESSIBLE_MIMETYPES = {'application/vnd.apache.parquet', 'text/event-stream', 'application/gzip'}
+
+
+class ResponseCompressor:
+    """Compresses finished Flask responses above `min_size` bytes
+
+    Streamed responses (SSE, exports) are left alone so they keep flushing
+    incrementally. Strong ETags are downgraded to weak ones on compressed
+    bodies, as the bytes no longer match the identity representation.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def choose_encoding(self, accept_encodings):
+        """'br', 'gzip' or None for a parsed Accept-Encoding header"""
+        return accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def apply(self, response, accept_encodings):
+        """Compress `response` in place if the client accepts it and it is worth it"""
+        if (response.is_streamed or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype in INCOMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        body = self.compress(data, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        self.compressed += 1
+        self.bytes_in += len(data)
+        self.bytes_out += len(body)
+        return response
+
+    def stats(self):
+        """Compressed response count and overall ratio"""
+        return {
+            'encodings': self.encodings,
+            'min_size_bytes': self.min_size,
+            'compressed_responses': self.compressed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None
+        }
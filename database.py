@@ -3,11 +3,26 @@ Database models and initialization for Algae Box System
 Using SQLAlchemy with SQLite
 """
 
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, event, inspect, case, delete, func, insert, select, text, Column, Integer, Float, String, DateTime, Boolean, ForeignKey, Text, Index, UniqueConstraint
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
-from datetime import datetime
+from sqlalchemy.schema import CreateTable
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from itertools import islice
+import csv
+import json
+import math
 import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed by `database.py export`
+    pa = None
 
 Base = declarative_base()
 
@@ -15,6 +30,48 @@ Base = declarative_base()
 DB_PATH = '/home/labKason/algae_box.db'
 DATABASE_URL = f'sqlite:///{DB_PATH}'
 
+# Engine profiles, selected with the ALGAE_DB_PROFILE environment variable.
+# 'default' keeps SQLite's stock settings (rollback journal, no busy timeout).
+# 'production' switches to WAL so readers don't block behind the writer, waits
+# on locks instead of failing, and sizes the pool per gunicorn worker (each
+# worker process owns its own pool). WAL needs a local filesystem, so keep
+# 'default' where the database lives on network storage.
+ENGINE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',         # safe with WAL; FULL fsyncs every commit
+        'busy_timeout_ms': 5000,
+        'cache_size_kb': 64000,          # ~64 MB page cache per connection
+        'mmap_size': 256 * 1024 * 1024,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+    },
+}
+
+# Rollup granularities in seconds (1 minute, 1 hour, 1 day; each divides the next)
+# and the channels they aggregate
+ROLLUP_GRANULARITIES = (60, 3600, 86400)
+ROLLUP_CHANNELS = ('ph', 'temperature_c', 'turbidity_ntu')
+EPOCH = datetime(1970, 1, 1)
+
+# PRAGMA user_version from which sensor_rollups covers every stored reading.
+# Files from before rollups existed stay below it until `rebuild-rollups` runs,
+# and rollup readers fall back to raw readings meanwhile.
+ROLLUPS_BACKFILLED_VERSION = 1
+
+# Tiered retention in days (None keeps forever): raw readings expire first and
+# coarser rollups are kept longer, so long-range charts outlive the raw data.
+RAW_RETENTION_DAYS = int(os.environ.get('ALGAE_RETENTION_RAW_DAYS', 30))
+ROLLUP_RETENTION_DAYS = {60: 90, 3600: 730, 86400: None}
+
+# Columns a logger CSV (like data/algae_log.csv) must have to be imported
+CSV_REQUIRED_COLUMNS = ('timestamp', 'turbidity_ntu', 'ph', 'temperature_c')
+CSV_INSERT_SQL = ('INSERT INTO sensor_readings (tank_id, timestamp, ph, temperature_c, turbidity_ntu, harvest_ready) '
+                  'VALUES (?, ?, ?, ?, ?, ?)')
+
 
 class Tank(Base):
     """Tank/cultivation system information"""
@@ -32,6 +89,7 @@ class Tank(Base):
     sensor_readings = relationship('SensorReading', back_populates='tank', cascade='all, delete-orphan')
     collection_events = relationship('CollectionEvent', back_populates='tank', cascade='all, delete-orphan')
     user_actions = relationship('UserAction', back_populates='tank', cascade='all, delete-orphan')
+    sensor_rollups = relationship('SensorRollup', back_populates='tank', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f"<Tank(id={self.id}, name='{self.name}', algae='{self.algae_type}')>"
@@ -40,6 +98,9 @@ class Tank(Base):
 class SensorReading(Base):
     """Sensor data readings"""
     __tablename__ = 'sensor_readings'
+    # Ids are the history, stream and export cursors, so they must only grow:
+    # without AUTOINCREMENT SQLite reuses the ids of deleted newest rows
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = Column(Integer, primary_key=True)
     tank_id = Column(Integer, ForeignKey('tanks.id'), nullable=False)
@@ -54,6 +115,9 @@ class SensorReading(Base):
     ph_safe = Column(Boolean)
     temperature_safe = Column(Boolean)
     harvest_ready = Column(Boolean)
+
+    # Ingest-time anomaly flags, e.g. 'ph:stuck,turbidity_ntu:spike' (None when normal)
+    anomaly_flags = Column(String(100))
     
     # Relationship
     tank = relationship('Tank', back_populates='sensor_readings')
@@ -62,6 +126,44 @@ class SensorReading(Base):
         return f"<SensorReading(tank={self.tank_id}, time={self.timestamp}, pH={self.ph:.2f}, turb={self.turbidity_ntu:.1f})>"
 
 
+class SensorRollup(Base):
+    """Pre-aggregated sensor readings per tank and time bucket (minute/hour/day)"""
+    __tablename__ = 'sensor_rollups'
+    __table_args__ = (
+        UniqueConstraint('tank_id', 'granularity', 'bucket_start', name='uq_sensor_rollups_bucket'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    tank_id = Column(Integer, ForeignKey('tanks.id'), nullable=False)
+    granularity = Column(Integer, nullable=False)  # Bucket width in seconds
+    bucket_start = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False)
+    last_timestamp = Column(DateTime)
+    
+    # Per-channel aggregates (mean = sum / count of that channel's non-null values)
+    ph_count = Column(Integer)
+    ph_sum = Column(Float)
+    ph_min = Column(Float)
+    ph_max = Column(Float)
+    ph_last = Column(Float)
+    temperature_c_count = Column(Integer)
+    temperature_c_sum = Column(Float)
+    temperature_c_min = Column(Float)
+    temperature_c_max = Column(Float)
+    temperature_c_last = Column(Float)
+    turbidity_ntu_count = Column(Integer)
+    turbidity_ntu_sum = Column(Float)
+    turbidity_ntu_min = Column(Float)
+    turbidity_ntu_max = Column(Float)
+    turbidity_ntu_last = Column(Float)
+    
+    # Relationship
+    tank = relationship('Tank', back_populates='sensor_rollups')
+    
+    def __repr__(self):
+        return f"<SensorRollup(tank={self.tank_id}, every={self.granularity}s, start={self.bucket_start}, n={self.count})>"
+
+
 class CollectionEvent(Base):
     """Algae collection/harvest events"""
     __tablename__ = 'collection_events'
@@ -134,25 +236,738 @@ class UserAction(Base):
         return f"<UserAction(tank={self.tank_id}, type='{self.action_type}', time={self.timestamp})>"
 
 
+# Composite indexes for the per-tank time-series queries ("latest reading for
+# tank N", "last 24h for tank N"): seek on tank_id, then walk timestamps in order.
+# Readings are paged by the (timestamp, id) key, so their index carries id as the
+# tiebreak in the same direction; newest-first lookups walk it backwards.
+Index('ix_sensor_readings_tank_id_timestamp_id', SensorReading.tank_id, SensorReading.timestamp, SensorReading.id)
+Index('ix_collection_events_tank_id_timestamp', CollectionEvent.tank_id, CollectionEvent.timestamp.desc())
+Index('ix_user_actions_tank_id_timestamp', UserAction.tank_id, UserAction.timestamp.desc())
+# Partial index: only flagged readings, so anomaly lookups stay small
+Index('ix_sensor_readings_anomaly_tank_id_timestamp', SensorReading.tank_id, SensorReading.timestamp.desc(),
+      sqlite_where=SensorReading.anomaly_flags.isnot(None))
+
+# How long migrate() waits for another process's schema change (index builds
+# and table rebuilds on large files) before giving up with "database is locked"
+SCHEMA_LOCK_TIMEOUT_MS = 10 * 60 * 1000
+
+# Values migrate() gives existing rows when it adds these columns. Rollups
+# written before per-channel counts existed counted every reading for every channel.
+COLUMN_BACKFILLS = {('sensor_rollups', f'{channel}_count'): 'count' for channel in ROLLUP_CHANNELS}
+
+# Indexes replaced by the ones above, dropped by migrate()
+SUPERSEDED_INDEXES = {'sensor_readings': ['ix_sensor_readings_tank_id_timestamp']}
+
+# Per-tank time-series tables written by `database.py export`
+EXPORT_MODELS = {model.__tablename__: model for model in (SensorReading, CollectionEvent, UserAction)}
+
+
+def bucket_start(timestamp, granularity):
+    """Start of the `granularity`-second bucket containing `timestamp` (epoch aligned)"""
+    seconds = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % granularity)
+
+
+def _rollup_keys():
+    """(channel, count, sum, min, max, last) column names per rollup channel"""
+    return [(c, f'{c}_count', f'{c}_sum', f'{c}_min', f'{c}_max', f'{c}_last') for c in ROLLUP_CHANNELS]
+
+
+def _merge_rollup(agg, part):
+    """Fold partial aggregate `part` into `agg` for the same tank and bucket"""
+    agg['count'] += part['count']
+    newest = part['last_timestamp'] >= agg['last_timestamp']
+    if newest:
+        agg['last_timestamp'] = part['last_timestamp']
+    for _, count_key, sum_key, min_key, max_key, last_key in _rollup_keys():
+        agg[count_key] += part[count_key]
+        agg[sum_key] += part[sum_key]
+        if part[min_key] is not None:
+            agg[min_key] = part[min_key] if agg[min_key] is None else min(agg[min_key], part[min_key])
+            agg[max_key] = part[max_key] if agg[max_key] is None else max(agg[max_key], part[max_key])
+        if newest and part[last_key] is not None:
+            agg[last_key] = part[last_key]
+
+
+def rollup_rows(rows):
+    """Fold reading rows (dicts of SensorReading columns) into per-bucket partial aggregates
+
+    Rows are folded into the finest granularity only; each coarser level is
+    merged from the level below it, so every row is visited once.
+    """
+    keys = _rollup_keys()
+    finest = ROLLUP_GRANULARITIES[0]
+    level = {}
+    for row in rows:
+        timestamp = row['timestamp']
+        seconds = int((timestamp - EPOCH).total_seconds())
+        key = (row['tank_id'], seconds - seconds % finest)
+        agg = level.get(key)
+        if agg is None:
+            agg = level[key] = {
+                'tank_id': key[0], 'granularity': finest, 'bucket_start': key[1],
+                'count': 0, 'last_timestamp': timestamp
+            }
+            for channel, count_key, sum_key, min_key, max_key, last_key in keys:
+                value = row[channel]
+                agg[count_key] = 0
+                agg[sum_key] = 0.0
+                agg[min_key] = agg[max_key] = agg[last_key] = value
+        agg['count'] += 1
+        newest = timestamp >= agg['last_timestamp']
+        if newest:
+            agg['last_timestamp'] = timestamp
+        for channel, count_key, sum_key, min_key, max_key, last_key in keys:
+            value = row[channel]
+            if value is None:
+                continue
+            agg[count_key] += 1
+            agg[sum_key] += value
+            if agg[min_key] is None or value < agg[min_key]:
+                agg[min_key] = value
+            if agg[max_key] is None or value > agg[max_key]:
+                agg[max_key] = value
+            if newest:
+                agg[last_key] = value
+
+    aggregates = list(level.values())
+    for granularity in ROLLUP_GRANULARITIES[1:]:
+        coarser = {}
+        for part in level.values():
+            key = (part['tank_id'], part['bucket_start'] - part['bucket_start'] % granularity)
+            agg = coarser.get(key)
+            if agg is None:
+                coarser[key] = dict(part, granularity=granularity, bucket_start=key[1])
+            else:
+                _merge_rollup(agg, part)
+        aggregates += coarser.values()
+        level = coarser
+
+    for agg in aggregates:
+        agg['bucket_start'] = EPOCH + timedelta(seconds=agg['bucket_start'])
+    return aggregates
+
+
+def rollups_backfilled(session):
+    """Whether sensor_rollups covers every reading (see ROLLUPS_BACKFILLED_VERSION)"""
+    return session.execute(text('PRAGMA user_version')).scalar() >= ROLLUPS_BACKFILLED_VERSION
+
+
+def apply_rollups(session, rows):
+    """Merge new reading rows into sensor_rollups within the caller's transaction
+
+    One upsert per touched (tank, granularity, bucket); the caller commits it
+    together with the raw readings so rollups never drift from them.
+    """
+    aggregates = rollup_rows(rows)
+    if not aggregates:
+        return
+    stmt = sqlite_insert(SensorRollup.__table__)  # Core insert: no ORM bookkeeping per aggregate
+    new = stmt.excluded
+    is_newer = new.last_timestamp >= SensorRollup.last_timestamp
+    updates = {
+        'count': SensorRollup.count + new.count,
+        'last_timestamp': case((is_newer, new.last_timestamp), else_=SensorRollup.last_timestamp)
+    }
+    for channel in ROLLUP_CHANNELS:
+        updates[f'{channel}_count'] = getattr(SensorRollup, f'{channel}_count') + getattr(new, f'{channel}_count')
+        updates[f'{channel}_sum'] = getattr(SensorRollup, f'{channel}_sum') + getattr(new, f'{channel}_sum')
+        # SQLite's scalar min()/max() return NULL if any argument is NULL, so a side
+        # with no values for the channel falls back to the other one
+        old_min, new_min = getattr(SensorRollup, f'{channel}_min'), getattr(new, f'{channel}_min')
+        old_max, new_max = getattr(SensorRollup, f'{channel}_max'), getattr(new, f'{channel}_max')
+        updates[f'{channel}_min'] = func.min(func.coalesce(old_min, new_min), func.coalesce(new_min, old_min))
+        updates[f'{channel}_max'] = func.max(func.coalesce(old_max, new_max), func.coalesce(new_max, old_max))
+        updates[f'{channel}_last'] = case((is_newer, getattr(new, f'{channel}_last')),
+                                          else_=getattr(SensorRollup, f'{channel}_last'))
+    stmt = stmt.on_conflict_do_update(index_elements=['tank_id', 'granularity', 'bucket_start'], set_=updates)
+    session.execute(stmt, aggregates)
+
+
+def _csv_float(value):
+    """Required, finite sensor value (the API rejects the same readings)"""
+    number = float(value)  # ValueError on blank cells too
+    if not math.isfinite(number):
+        raise ValueError(f'non-finite value {value!r}')
+    return number
+
+
+def _csv_bool(value):
+    return value.strip().lower() in ('true', '1', 'yes')
+
+
+def _csv_timestamp(value):
+    """Naive local datetime from an ISO timestamp, as the API stores readings"""
+    ts = datetime.fromisoformat(value.strip())
+    return ts.astimezone().replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _partition_path(out_dir, table, tank_id, date):
+    """Parquet file of one tank/day export partition"""
+    return os.path.join(out_dir, table, f'tank_id={tank_id}', f'date={date}', 'part.parquet')
+
+
+def _arrow_type(column):
+    """pyarrow type for a SQLAlchemy column"""
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp('us')
+    return pa.string()
+
+
 class Database:
     """Database management class"""
     
-    def __init__(self, db_url=DATABASE_URL):
-        """Initialize database connection"""
-        self.engine = create_engine(db_url, echo=False)
+    def __init__(self, db_url=DATABASE_URL, profile=None, **overrides):
+        """Initialize database connection
+
+        `profile` names an entry of ENGINE_PROFILES (default: $ALGAE_DB_PROFILE
+        or 'default'); keyword overrides replace individual profile settings,
+        and $ALGAE_DB_SYNCHRONOUS overrides the synchronous level.
+        """
+        self.profile = profile or os.environ.get('ALGAE_DB_PROFILE', 'default')
+        if self.profile not in ENGINE_PROFILES:
+            raise ValueError(f"Unknown database profile '{self.profile}' (choose from {', '.join(ENGINE_PROFILES)})")
+
+        settings = dict(ENGINE_PROFILES[self.profile])
+        if os.environ.get('ALGAE_DB_SYNCHRONOUS'):
+            settings['synchronous'] = os.environ['ALGAE_DB_SYNCHRONOUS']
+        settings.update(overrides)
+        self.settings = settings
+
+        engine_args = {'echo': False}
+        for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle'):
+            if key in settings:
+                engine_args[key] = settings[key]
+        if db_url.startswith('sqlite') and 'busy_timeout_ms' in settings:
+            engine_args['connect_args'] = {'timeout': settings['busy_timeout_ms'] / 1000}
+
+        self.engine = create_engine(db_url, **engine_args)
+        if db_url.startswith('sqlite'):
+            event.listen(self.engine, 'connect', self._apply_pragmas)
         self.Session = sessionmaker(bind=self.engine)
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        """Apply the profile's SQLite pragmas to every new connection"""
+        pragmas = {
+            'journal_mode': self.settings.get('journal_mode'),
+            'synchronous': self.settings.get('synchronous'),
+            'busy_timeout': self.settings.get('busy_timeout_ms'),
+            # Negative cache_size is in KiB rather than pages
+            'cache_size': -self.settings['cache_size_kb'] if 'cache_size_kb' in self.settings else None,
+            'mmap_size': self.settings.get('mmap_size'),
+        }
+        cursor = dbapi_connection.cursor()
+        if cursor.execute('PRAGMA page_count').fetchone()[0] == 0:
+            # New file: let purge_expired() hand freed pages back to the filesystem.
+            # Must precede journal_mode, which writes the file header.
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        for name, value in pragmas.items():
+            if value is not None:
+                cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
         
     def init_db(self):
         """Create all tables"""
-        Base.metadata.create_all(self.engine)
-        print(f"✅ Database initialized: {DB_PATH}")
+        self.migrate()
+        print(f"✅ Database initialized: {self.engine.url.database} (profile: {self.profile})")
         
         # Seed algae species if empty
         session = self.Session()
-        if session.query(AlgaeSpecies).count() == 0:
-            self.seed_algae_species(session)
-        session.close()
+        try:
+            if session.query(AlgaeSpecies).count() == 0:
+                self.seed_algae_species(session)
+        except IntegrityError:
+            session.rollback()  # Another worker starting up seeded them first
+        finally:
+            session.close()
     
+    @contextmanager
+    def _schema_lock(self):
+        """Connection inside a write transaction taken up front (BEGIN IMMEDIATE)
+
+        Every worker runs migrate() at startup: holding SQLite's write lock
+        from the first schema check to the commit makes check-then-create
+        atomic, so the other workers wait (up to SCHEMA_LOCK_TIMEOUT_MS, as
+        an index build on a large file takes a while) and then find the
+        schema done instead of failing on "already exists".
+        """
+        if self.engine.dialect.name != 'sqlite':
+            with self.engine.begin() as conn:
+                yield conn
+            return
+        with self.engine.connect() as conn:
+            raw = conn.connection.dbapi_connection
+            previous = raw.execute('PRAGMA busy_timeout').fetchone()[0]
+            raw.execute(f'PRAGMA busy_timeout = {SCHEMA_LOCK_TIMEOUT_MS}')
+            try:
+                raw.execute('BEGIN IMMEDIATE')
+                try:
+                    yield conn
+                    raw.commit()
+                except BaseException:
+                    raw.rollback()
+                    raise
+            finally:
+                raw.execute(f'PRAGMA busy_timeout = {previous}')
+
+    def migrate(self, rebuild_tables=False):
+        """Bring an existing database file up to the current schema
+
+        Creates new tables, then adds the columns and indexes create_all()
+        skips on tables that already exist, all in one write transaction.
+        Tables that now need AUTOINCREMENT ids are only rebuilt with
+        `rebuild_tables` (`python database.py migrate`): the copy takes long
+        on large files, and migrate() also runs in every worker at startup.
+        Returns the names of columns and indexes added.
+        """
+        pending = self._autoincrement_pending()
+        if pending and rebuild_tables:
+            for table in pending:
+                if self._rebuild_autoincrement(table):
+                    print(f"✅ Rebuilt {table.name} with AUTOINCREMENT ids")
+        elif pending:
+            print(f"⚠️ {', '.join(t.name for t in pending)} may reuse deleted ids, which breaks history and "
+                  f"stream cursors: stop the API and run `python database.py migrate`")
+
+        added = []
+        created = []
+        dropped = []
+        with self._schema_lock() as conn:
+            Base.metadata.create_all(conn, checkfirst=True)
+            inspector = inspect(conn)
+            for table in Base.metadata.sorted_tables:
+                existing = {c['name'] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        # New columns are nullable without defaults, which ADD COLUMN allows
+                        conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} '
+                                             f'{column.type.compile(dialect=conn.dialect)}')
+                        backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+                        if backfill:
+                            conn.exec_driver_sql(f'UPDATE {table.name} SET {column.name} = {backfill}')
+                        added.append(f'{table.name}.{column.name}')
+
+                existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(conn, checkfirst=True)
+                        created.append(index.name)
+                for name in SUPERSEDED_INDEXES.get(table.name, []):
+                    if name in existing:
+                        conn.exec_driver_sql(f'DROP INDEX IF EXISTS {name}')
+                        dropped.append(name)
+
+            if created:
+                # Refresh planner statistics so the new indexes get used
+                conn.exec_driver_sql('ANALYZE')
+
+            # Files from before rollups existed need a one-off backfill. It is left to
+            # the explicit command: migrate() runs in every worker at startup, and
+            # concurrent rebuilds (or ingest during one) would count readings twice.
+            # Until it has run, rollup readers use raw readings (see rollups_backfilled).
+            backfilled = conn.exec_driver_sql('PRAGMA user_version').scalar() >= ROLLUPS_BACKFILLED_VERSION
+            if not backfilled and self._rollups_cover_readings(conn):
+                conn.exec_driver_sql(f'PRAGMA user_version = {ROLLUPS_BACKFILLED_VERSION}')
+                backfilled = True
+
+        if added:
+            print(f"✅ Added columns: {', '.join(added)}")
+        for name in dropped:
+            print(f"🗑️ Dropped superseded index: {name}")
+        if created:
+            print(f"✅ Created indexes: {', '.join(created)}")
+        if not backfilled:
+            print("ℹ️ Rollups do not cover every reading yet: history, trends and forecasts read raw "
+                  "readings until you stop the API and run `python database.py rebuild-rollups`")
+        return added + created
+
+    def _rollups_cover_readings(self, conn):
+        """Whether minute rollups count at least every raw reading still stored
+
+        True for new files and for files that have maintained rollups since
+        their first reading. Retention may leave the oldest minute with more
+        rolled up than raw readings, hence "at least".
+        """
+        count, oldest = conn.execute(select(func.count(SensorReading.id), func.min(SensorReading.timestamp))).one()
+        if not count:
+            return True
+        rolled_up = conn.scalar(
+            select(func.coalesce(func.sum(SensorRollup.count), 0))
+            .where(SensorRollup.granularity == ROLLUP_GRANULARITIES[0],
+                   SensorRollup.bucket_start >= bucket_start(oldest, ROLLUP_GRANULARITIES[0]))
+        )
+        return rolled_up >= count
+
+    def _autoincrement_pending(self):
+        """Tables declared AUTOINCREMENT whose table in the file was created without it"""
+        if self.engine.dialect.name != 'sqlite':
+            return []
+        pending = []
+        with self.engine.connect() as conn:
+            for table in Base.metadata.sorted_tables:
+                if not table.dialect_options['sqlite']['autoincrement']:
+                    continue
+                sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                           (table.name,)).scalar()
+                if sql and 'AUTOINCREMENT' not in sql.upper():
+                    pending.append(table)
+        return pending
+
+    def _rebuild_autoincrement(self, table):
+        """Recreate `table` with AUTOINCREMENT ids if the file predates them
+
+        SQLite cannot ALTER a primary key, so the rows are copied into a new
+        table that replaces the old one, under the schema lock, re-checking
+        the schema once it holds it. Indexes go with the old table;
+        migrate() recreates them. Returns True if rebuilt.
+        """
+        with self._schema_lock() as conn:
+            ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+            sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                       (table.name,)).scalar()
+            if 'AUTOINCREMENT' in sql.upper():
+                return False  # Done by another process while we waited for the lock
+            existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+            columns = ', '.join(c.name for c in table.columns if c.name in existing)
+            staging = f'{table.name}_rebuild'
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS {staging}')
+            conn.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {staging} ', 1))
+            # Copying the ids also moves sqlite_sequence past the highest one
+            conn.exec_driver_sql(f'INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}')
+            conn.exec_driver_sql(f'DROP TABLE {table.name}')
+            conn.exec_driver_sql(f'ALTER TABLE {staging} RENAME TO {table.name}')
+        return True
+
+    def rebuild_rollups(self, tank_id=None, chunk_size=50000):
+        """Recompute sensor_rollups from raw readings (all tanks or one tank)
+
+        Streams readings in id order `chunk_size` rows at a time and commits
+        per chunk, so memory stays bounded on large files. A full rebuild
+        marks the rollups backfilled once done. Returns rows read.
+        """
+        session = self.Session()
+        try:
+            stale = session.query(SensorRollup)
+            if tank_id is not None:
+                stale = stale.filter(SensorRollup.tank_id == tank_id)
+            else:
+                # Readers use raw readings while the rollups are partial
+                session.execute(text('PRAGMA user_version = 0'))
+            stale.delete(synchronize_session=False)
+            session.commit()
+
+            columns = [SensorReading.id, SensorReading.tank_id, SensorReading.timestamp,
+                       *(getattr(SensorReading, channel) for channel in ROLLUP_CHANNELS)]
+            last_id = 0
+            total = 0
+            while True:
+                query = session.query(*columns).filter(SensorReading.id > last_id)
+                if tank_id is not None:
+                    query = query.filter(SensorReading.tank_id == tank_id)
+                rows = query.order_by(SensorReading.id).limit(chunk_size).all()
+                if not rows:
+                    break
+                apply_rollups(session, [row._asdict() for row in rows])
+                session.commit()
+                last_id = rows[-1].id
+                total += len(rows)
+            if tank_id is None:
+                session.execute(text(f'PRAGMA user_version = {ROLLUPS_BACKFILLED_VERSION}'))
+                session.commit()
+            print(f"✅ Rebuilt rollups from {total} readings")
+            return total
+        finally:
+            session.close()
+
+    def import_csv(self, path, tank_id, chunk_size=50000):
+        """Stream a logger CSV (timestamp, turbidity_ntu, ph, temperature_c, ...) into a tank
+
+        Reads `chunk_size` rows at a time and bulk inserts each chunk with one
+        executemany in its own transaction, together with its rollups. Rows
+        whose (tank_id, timestamp) is already stored are skipped, so importing
+        the same file twice is a no-op. Rows with a blank or non-finite sensor
+        value are counted as invalid and skipped, as the API rejects them.
+        Rows with collection_triggered set also record a CollectionEvent. Returns import counters and rows/s.
+        """
+        started = time.perf_counter()
+        stats = {'rows_read': 0, 'rows_inserted': 0, 'duplicates': 0, 'invalid': 0, 'collection_events': 0}
+        session = self.Session()
+        try:
+            if session.get(Tank, tank_id) is None:
+                raise ValueError(f'Tank {tank_id} not found')
+
+            with open(path, newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                missing = [c for c in CSV_REQUIRED_COLUMNS if c not in header]
+                if missing:
+                    raise ValueError(f"missing columns {', '.join(missing)}")
+                col = {name: i for i, name in enumerate(header)}
+                harvest_col = col.get('harvest_ready')
+                collection_col = col.get('collection_triggered')
+                notes_col = col.get('notes')
+
+                while True:
+                    chunk = list(islice(reader, chunk_size))
+                    if not chunk:
+                        break
+                    stats['rows_read'] += len(chunk)
+
+                    rows = {}  # timestamp -> row; first occurrence wins within the file
+                    events = []
+                    for record in chunk:
+                        try:
+                            row = {
+                                'tank_id': tank_id,
+                                'timestamp': _csv_timestamp(record[col['timestamp']]),
+                                'turbidity_ntu': _csv_float(record[col['turbidity_ntu']]),
+                                'ph': _csv_float(record[col['ph']]),
+                                'temperature_c': _csv_float(record[col['temperature_c']]),
+                                'harvest_ready': _csv_bool(record[harvest_col]) if harvest_col is not None else None
+                            }
+                        except (IndexError, ValueError):
+                            stats['invalid'] += 1
+                            continue
+                        if row['timestamp'] in rows:
+                            stats['duplicates'] += 1
+                            continue
+                        rows[row['timestamp']] = row
+                        if collection_col is not None and _csv_bool(record[collection_col]):
+                            events.append({
+                                'tank_id': tank_id,
+                                'timestamp': row['timestamp'],
+                                'turbidity_before': row['turbidity_ntu'],
+                                'notes': (record[notes_col] if notes_col is not None else '') or 'Imported from CSV'
+                            })
+                    if not rows:
+                        continue
+
+                    # One index range scan finds every already-stored timestamp of the chunk
+                    stored = set(session.scalars(
+                        select(SensorReading.timestamp)
+                        .where(SensorReading.tank_id == tank_id)
+                        .where(SensorReading.timestamp.between(min(rows), max(rows)))
+                    ))
+                    new_rows = [row for ts, row in rows.items() if ts not in stored]
+                    stats['duplicates'] += len(rows) - len(new_rows)
+                    events = [e for e in events if e['timestamp'] not in stored]
+                    if new_rows:
+                        # Straight to the driver's executemany: per-row SQLAlchemy bind
+                        # processing would dominate the import time. Timestamps use the
+                        # same text format as SQLAlchemy's SQLite DateTime.
+                        session.connection().exec_driver_sql(CSV_INSERT_SQL, [
+                            (tank_id, r['timestamp'].isoformat(' ', 'microseconds'), r['ph'],
+                             r['temperature_c'], r['turbidity_ntu'], r['harvest_ready'])
+                            for r in new_rows
+                        ])
+                        apply_rollups(session, new_rows)
+                    if events:
+                        session.execute(insert(CollectionEvent.__table__), events)
+                    session.commit()
+                    stats['rows_inserted'] += len(new_rows)
+                    stats['collection_events'] += len(events)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        stats['rows_per_second'] = round(stats['rows_read'] / stats['seconds']) if stats['seconds'] else 0
+        return stats
+
+    def export_parquet(self, out_dir, tables=None, batch_size=50000, raw_days=RAW_RETENTION_DAYS, now=None):
+        """Export per-tank tables to Parquet files partitioned by tank and day
+
+        Writes <out_dir>/<table>/tank_id=<id>/date=<YYYY-MM-DD>/part.parquet
+        (hive layout, readable with pandas.read_parquet(<out_dir>/<table>)).
+        A manifest in <out_dir> records each partition's (row count, max id);
+        later runs rewrite only partitions whose fingerprint changed and remove
+        partitions whose rows are gone. Reading days up to the `raw_days`
+        retention cutoff are archived instead: `purge` deletes their rows, so
+        exported partitions are kept as they are. Each partition is streamed
+        from its own short read in `batch_size` row batches, so memory stays
+        bounded.
+        """
+        if pa is None:
+            raise RuntimeError('pyarrow is required for Parquet export (pip install pyarrow)')
+        started = time.perf_counter()
+        manifest_path = os.path.join(out_dir, '_manifest.json')
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f).get('tables', {})
+
+        # Last day purge_expired() may have deleted readings from (it cuts mid-day)
+        raw_cutoff = ((now or datetime.now()) - timedelta(days=raw_days)).date().isoformat()
+
+        stats = {}
+        for table in tables or EXPORT_MODELS:
+            model = EXPORT_MODELS[table]
+            previous = manifest.get(table, {})
+            current = {}
+            counters = stats[table] = {'written': 0, 'unchanged': 0, 'archived': 0, 'removed': 0, 'rows': 0}
+
+            def archived(key, max_id=0):
+                """Previously exported partition whose rows may have been purged since"""
+                date = key.split('/')[1]
+                return (model is SensorReading and date <= raw_cutoff and key in previous
+                        and max_id <= previous[key][1]
+                        and os.path.exists(_partition_path(out_dir, table, *key.split('/'))))
+
+            day = func.date(model.timestamp)
+            session = self.Session()
+            try:
+                fingerprints = session.query(model.tank_id, day, func.count(model.id), func.max(model.id))\
+                                      .filter(model.timestamp.isnot(None))\
+                                      .group_by(model.tank_id, day).all()
+            finally:
+                session.close()
+
+            for tank_id, date, count, max_id in fingerprints:
+                key = f'{tank_id}/{date}'
+                if previous.get(key) == [count, max_id] and os.path.exists(_partition_path(out_dir, table, tank_id, date)):
+                    current[key] = previous[key]
+                    counters['unchanged'] += 1
+                    continue
+                if archived(key, max_id):
+                    # Fewer rows and no new ones: purged, so keep the full export
+                    current[key] = previous[key]
+                    counters['archived'] += 1
+                    continue
+                current[key] = self._export_partition(model, out_dir, tank_id, date, batch_size)
+                counters['written'] += 1
+                counters['rows'] += current[key][0]
+
+            for key in set(previous) - set(current):
+                if archived(key):
+                    current[key] = previous[key]
+                    counters['archived'] += 1
+                    continue
+                path = _partition_path(out_dir, table, *key.split('/'))
+                if os.path.exists(path):
+                    os.remove(path)
+                    os.removedirs(os.path.dirname(path))  # and the tank directory once empty
+                counters['removed'] += 1
+            manifest[table] = current
+
+        os.makedirs(out_dir, exist_ok=True)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump({'exported_at': datetime.now().isoformat(), 'tables': manifest}, f, indent=1, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        return {'tables': stats, 'seconds': round(time.perf_counter() - started, 3)}
+
+    def _export_partition(self, model, out_dir, tank_id, date, batch_size):
+        """Write one tank/day partition; returns its [row count, max id] fingerprint"""
+        columns = [c for c in model.__table__.columns if c.name != 'tank_id']  # tank_id is in the path
+        schema = pa.schema([(c.name, _arrow_type(c)) for c in columns])
+        start = datetime.fromisoformat(date)
+        path = _partition_path(out_dir, model.__tablename__, tank_id, date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        count = max_id = 0
+        session = self.Session()
+        try:
+            result = session.execute(
+                select(*columns)
+                .where(model.tank_id == tank_id)
+                .where(model.timestamp >= start, model.timestamp < start + timedelta(days=1))
+                .order_by(model.timestamp, model.id)
+                .execution_options(yield_per=batch_size)
+            )
+            with pq.ParquetWriter(path + '.tmp', schema) as writer:
+                for rows in result.partitions():
+                    values = list(zip(*rows))
+                    writer.write_table(pa.table(
+                        [pa.array(v, type=field.type) for v, field in zip(values, schema)], schema=schema))
+                    count += len(rows)
+                    max_id = max(max_id, max(values[0]))
+        finally:
+            session.close()
+        os.replace(path + '.tmp', path)
+        return [count, max_id]
+
+    def delete_in_batches(self, model, *criteria, batch_size=5000):
+        """Delete rows matching `criteria`, committing every `batch_size` rows
+
+        Each batch is its own short transaction, so the writer lock is never
+        held for long. Returns the number of rows deleted.
+        """
+        total = 0
+        while True:
+            ids = select(model.id).where(*criteria).limit(batch_size).scalar_subquery()
+            with self.engine.begin() as conn:
+                deleted = conn.execute(delete(model).where(model.id.in_(ids))).rowcount
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+    def purge_expired(self, raw_days=RAW_RETENTION_DAYS, now=None, batch_size=5000, vacuum_pages=1000):
+        """Apply the retention policy and report rows purged and bytes reclaimed
+
+        Raw readings older than `raw_days` and rollups past their tier in
+        ROLLUP_RETENTION_DAYS are deleted in batches, then freed pages are
+        released with incremental vacuum (when the file has it enabled).
+        """
+        now = now or datetime.now()
+        before = self.storage_stats()
+
+        purged = {'sensor_readings': self.delete_in_batches(
+            SensorReading, SensorReading.timestamp < now - timedelta(days=raw_days), batch_size=batch_size)}
+        for granularity, days in ROLLUP_RETENTION_DAYS.items():
+            if days is None:
+                continue
+            purged[f'sensor_rollups_{granularity}s'] = self.delete_in_batches(
+                SensorRollup,
+                SensorRollup.granularity == granularity,
+                SensorRollup.bucket_start < now - timedelta(days=days),
+                batch_size=batch_size
+            )
+
+        if before['auto_vacuum'] == 'incremental':
+            self.incremental_vacuum(vacuum_pages)
+        after = self.storage_stats()
+        return {
+            'rows_purged': purged,
+            'bytes_reclaimed': before['file_bytes'] - after['file_bytes'],
+            'file_bytes': after['file_bytes'],
+            'free_bytes': after['free_bytes'],
+            'auto_vacuum': after['auto_vacuum']
+        }
+
+    def incremental_vacuum(self, pages_per_step=1000):
+        """Return free pages to the filesystem a few at a time"""
+        while True:
+            with self.engine.connect() as conn:
+                if not conn.exec_driver_sql('PRAGMA freelist_count').scalar():
+                    return
+                # executescript() steps the pragma to completion; execute() frees a single page
+                conn.connection.dbapi_connection.executescript(f'PRAGMA incremental_vacuum({pages_per_step});')
+
+    def enable_incremental_vacuum(self):
+        """Switch an existing file to auto_vacuum=INCREMENTAL (rewrites it with VACUUM)"""
+        with self.engine.connect() as conn:
+            conn.connection.dbapi_connection.executescript('PRAGMA auto_vacuum = INCREMENTAL; VACUUM;')
+
+    def storage_stats(self):
+        """Database file size, free space and vacuum mode"""
+        with self.engine.connect() as conn:
+            page_size = conn.exec_driver_sql('PRAGMA page_size').scalar()
+            page_count = conn.exec_driver_sql('PRAGMA page_count').scalar()
+            freelist = conn.exec_driver_sql('PRAGMA freelist_count').scalar()
+            auto_vacuum = conn.exec_driver_sql('PRAGMA auto_vacuum').scalar()
+        return {
+            'file_bytes': page_size * page_count,
+            'free_bytes': page_size * freelist,
+            'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum, str(auto_vacuum))
+        }
+
     def seed_algae_species(self, session):
         """Add default algae species data"""
         species_data = [
@@ -233,8 +1048,85 @@ class Database:
 db = Database()
 
 
-if __name__ == "__main__":
-    """Initialize database when run directly"""
+def main(argv=None):
+    """Command line entry point: `python database.py [init|migrate|rebuild-rollups|purge|vacuum|import-csv|export]`"""
+    import argparse
+    parser = argparse.ArgumentParser(description='Algae Box database tools')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('init', help='Create tables and seed species (default)')
+    subparsers.add_parser('migrate', help='Add missing columns and indexes to an existing database file '
+                                           'and rebuild tables whose ids must not be reused (stop the API first)')
+    rebuild = subparsers.add_parser('rebuild-rollups', help='Recompute minute/hour/day rollups from raw readings')
+    rebuild.add_argument('--tank', type=int, help='Only rebuild this tank')
+    purge = subparsers.add_parser('purge', help='Delete readings and rollups past their retention period')
+    purge.add_argument('--raw-days', type=int, default=RAW_RETENTION_DAYS, help='Days of raw readings to keep')
+    purge.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per transaction')
+    subparsers.add_parser('vacuum', help='Enable incremental vacuum on an existing file (full rewrite)')
+    import_csv = subparsers.add_parser('import-csv', help='Bulk load logger CSV files (data/algae_log.csv format)')
+    import_csv.add_argument('paths', nargs='+', help='CSV files to import')
+    import_csv.add_argument('--tank', type=int, required=True, help='Tank the readings belong to')
+    import_csv.add_argument('--chunk-size', type=int, default=50000, help='Rows inserted per transaction')
+    export = subparsers.add_parser('export', help='Export readings, collections and actions to Parquet by tank and day')
+    export.add_argument('out_dir', help='Output directory (re-runs only rewrite changed partitions)')
+    export.add_argument('--table', action='append', choices=list(EXPORT_MODELS), help='Only export this table')
+    export.add_argument('--batch-size', type=int, default=50000, help='Rows held in memory per write')
+    export.add_argument('--raw-days', type=int, default=RAW_RETENTION_DAYS,
+                        help='Retention used by purge; older reading partitions are kept once exported')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        try:
+            stats = db.export_parquet(args.out_dir, tables=args.table, batch_size=args.batch_size,
+                                      raw_days=args.raw_days)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        for table, counters in stats['tables'].items():
+            print(f"  - {table}: {counters['written']} partitions written ({counters['rows']} rows), "
+                  f"{counters['unchanged']} unchanged, {counters['archived']} archived, {counters['removed']} removed")
+        print(f"✅ Exported to {args.out_dir} in {stats['seconds']}s")
+        return
+
+    if args.command == 'import-csv':
+        db.migrate()
+        for path in args.paths:
+            try:
+                stats = db.import_csv(path, args.tank, chunk_size=args.chunk_size)
+            except (OSError, ValueError) as e:
+                print(f"❌ {path}: {e}")
+                raise SystemExit(1)
+            print(f"✅ {path}: {stats['rows_inserted']} of {stats['rows_read']} rows imported into tank {args.tank} "
+                  f"in {stats['seconds']}s ({stats['rows_per_second']:,} rows/s; {stats['duplicates']} duplicates, "
+                  f"{stats['invalid']} invalid, {stats['collection_events']} collection events)")
+        return
+
+    if args.command == 'purge':
+        stats = db.purge_expired(raw_days=args.raw_days, batch_size=args.batch_size)
+        for table, count in stats['rows_purged'].items():
+            print(f"  - {table}: {count} rows purged")
+        print(f"✅ Reclaimed {stats['bytes_reclaimed'] / 1e6:.1f} MB, file now {stats['file_bytes'] / 1e6:.1f} MB "
+              f"({stats['free_bytes'] / 1e6:.1f} MB free, auto_vacuum={stats['auto_vacuum']})")
+        if stats['auto_vacuum'] != 'incremental':
+            print("ℹ️ Run `python database.py vacuum` once to let purges shrink the file")
+        return
+
+    if args.command == 'vacuum':
+        db.enable_incremental_vacuum()
+        print(f"✅ Incremental vacuum enabled: {db.storage_stats()}")
+        return
+
+    if args.command == 'rebuild-rollups':
+        Base.metadata.create_all(db.engine)
+        db.rebuild_rollups(tank_id=args.tank)
+        return
+
+    if args.command == 'migrate':
+        print(f"Migrating {db.engine.url.database}...")
+        created = db.migrate(rebuild_tables=True)
+        if not created:
+            print("✅ Schema already up to date")
+        return
+
     print("Initializing Algae Box Database...")
     db.init_db()
     
@@ -247,3 +1139,7 @@ if __name__ == "__main__":
     session.close()
     
     print("\n✅ Database ready!")
+
+
+if __name__ == "__main__":
+    main()
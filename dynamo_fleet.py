@@ -0,0 +1,84 @@
+"""
+Fleet overview for the DynamoDB dashboard (blank.py)
+Discovers devices and their latest readings from a writer-maintained latest table
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from dynamo_history import HISTORY_ATTRIBUTES, items_frame
+
+# One item per device (hash key device_id), overwritten with each new reading
+LATEST_TABLE_NAME = "TankLatest"
+
+
+def record_latest(client, item, table_name=LATEST_TABLE_NAME):
+    """Writer side: store a low-level reading item as its device's latest
+
+    Call it (e.g. from the ingest Lambda or IoT rule target) next to the put
+    into the history table. The write is unconditional because the sort key
+    is device uptime, which restarts at 0 after a reboot.
+    """
+    client.put_item(TableName=table_name, Item=item)
+
+
+class FleetReader:
+    """Latest reading of every device
+
+    Reads the whole latest table with one Scan (paged only past 1 MB), so
+    the overview costs one round trip whatever the number of tanks. Until
+    that table exists it falls back to querying each known device's newest
+    history item concurrently.
+    """
+
+    def __init__(self, client, history_reader, table_name=LATEST_TABLE_NAME,
+                 attributes=HISTORY_ATTRIBUTES, max_workers=8):
+        self.client = client
+        self.history = history_reader
+        self.table_name = table_name
+        self.attributes = attributes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dynamo-fleet')
+        self._lock = threading.Lock()
+        self.scans = 0
+        self.fallbacks = 0
+
+    def _scan(self):
+        names = {f'#a{i}': name for i, name in enumerate(['device_id'] + list(self.attributes))}
+        args = dict(TableName=self.table_name, ProjectionExpression=', '.join(names),
+                    ExpressionAttributeNames=names)
+        items = []
+        while True:
+            response = self.client.scan(**args)
+            items.extend(response.get('Items', []))
+            if not response.get('LastEvaluatedKey'):
+                return items
+            args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _query_latest(self, device_ids):
+        """Newest history item of each device, queried side by side"""
+        latest = self._executor.map(self.history.latest_item, device_ids)
+        return [dict(item, device_id={'S': device_id})
+                for device_id, item in zip(device_ids, latest) if item is not None]
+
+    def overview(self, fallback_ids=()):
+        """DataFrame with one row per device (device_id plus attributes), sorted by device_id
+
+        `fallback_ids` are the devices to query when the latest table is missing.
+        """
+        try:
+            items = self._scan()
+            with self._lock:
+                self.scans += 1
+        except self.client.exceptions.ResourceNotFoundException:
+            items = self._query_latest(fallback_ids)
+            with self._lock:
+                self.fallbacks += 1
+        df = items_frame(items, self.attributes, int_column='timestamp')
+        df.insert(0, 'device_id', pd.Series([item['device_id']['S'] for item in items], dtype=object))
+        return df.sort_values('device_id', ignore_index=True)
+
+    def stats(self):
+        with self._lock:
+            return {'scans': self.scans, 'fallbacks': self.fallbacks}
@@ -0,0 +1,157 @@
+"""
+DynamoDB history reader for the Algae Box dashboard (blank.py)
+Follows query pagination, splits long ranges into parallel time slices
+and returns a typed DataFrame
+"""
+
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from boto3.dynamodb.types import TypeDeserializer
+
+# Attributes the charts use; everything else on the item is left on the server
+HISTORY_ATTRIBUTES = ['timestamp', 'temperature', 'ph', 'turbidity_ntu', 'salinity']
+
+# Sort-key span (device milliseconds) of one parallel range segment
+SEGMENT_MS = 6 * 3600 * 1000
+
+
+class FloatDeserializer(TypeDeserializer):
+    """TypeDeserializer that returns DynamoDB numbers as float instead of Decimal"""
+
+    def _deserialize_n(self, value):
+        return float(value)
+
+
+_deserializer = FloatDeserializer()
+
+
+def deserialize_item(item):
+    """Plain dict (numbers as float) from a low-level DynamoDB item"""
+    return {name: _deserializer.deserialize(value) for name, value in item.items()}
+
+
+def items_frame(items, attributes, int_column=None):
+    """DataFrame of numeric `attributes` from low-level items (NaN where an item lacks one)
+
+    Reads the number strings straight into float64 NumPy arrays, one pass
+    per column, without Decimal or per-item dicts; `int_column` is cast to int64.
+    """
+    columns = {}
+    for name in attributes:
+        values = []
+        for item in items:
+            value = item.get(name)
+            values.append(value.get('N', 'nan') if value is not None else 'nan')
+        columns[name] = np.array(values, dtype=np.float64)
+    if int_column is not None:
+        columns[int_column] = columns[int_column].astype(np.int64)
+    return pd.DataFrame(columns, copy=False)
+
+
+class HistoryReader:
+    """Reads one device's items from a table keyed by (device_id, timestamp)
+
+    Uses a low-level client, which (unlike a boto3 resource) is safe to
+    share between the worker threads that query range segments.
+    """
+
+    def __init__(self, client, table_name, attributes=HISTORY_ATTRIBUTES, hash_key='device_id',
+                 range_key='timestamp', max_workers=4, segment_ms=SEGMENT_MS):
+        self.client = client
+        self.table_name = table_name
+        self.attributes = attributes if range_key in attributes else [range_key] + list(attributes)
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.segment_ms = segment_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dynamo-history')
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.pages = 0
+        self.items = 0
+
+    def _query(self, device_id, between=None, **kwargs):
+        """Query arguments projecting only self.attributes (placeholders dodge reserved words)"""
+        names = {f'#a{i}': name for i, name in enumerate(self.attributes)}
+        names['#k'] = self.hash_key
+        values = {':d': {'S': device_id}}
+        condition = '#k = :d'
+        if between is not None:
+            range_name = f'#a{self.attributes.index(self.range_key)}'
+            condition += f' AND {range_name} BETWEEN :lo AND :hi'
+            values[':lo'] = {'N': str(between[0])}
+            values[':hi'] = {'N': str(between[1])}
+        return dict(
+            TableName=self.table_name,
+            KeyConditionExpression=condition,
+            ProjectionExpression=', '.join(f'#a{i}' for i in range(len(self.attributes))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            **kwargs
+        )
+
+    def _pages(self, args, limit=None):
+        """Items of every page of a query, following LastEvaluatedKey (up to `limit` items)"""
+        items = []
+        with self._lock:
+            self.queries += 1
+        while True:
+            if limit is not None:
+                args['Limit'] = limit - len(items)
+            response = self.client.query(**args)
+            items.extend(response.get('Items', []))
+            with self._lock:
+                self.pages += 1
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key or (limit is not None and len(items) >= limit):
+                break
+            args['ExclusiveStartKey'] = start_key
+        with self._lock:
+            self.items += len(items)
+        return items
+
+    def _frame(self, items):
+        """DataFrame with an int64 sort key and float64 channels"""
+        return items_frame(items, self.attributes, int_column=self.range_key)
+
+    def latest_item(self, device_id):
+        """The device's newest low-level item, or None"""
+        response = self.client.query(**self._query(device_id, ScanIndexForward=False, Limit=1))
+        items = response.get('Items', [])
+        return items[0] if items else None
+
+    def latest(self, device_id):
+        """The device's newest item as a dict, or None"""
+        item = self.latest_item(device_id)
+        return deserialize_item(item) if item else None
+
+    def last_n(self, device_id, n=100):
+        """The device's newest `n` items, oldest first"""
+        items = self._pages(self._query(device_id, ScanIndexForward=False), limit=n)
+        items.reverse()
+        return self._frame(items)
+
+    def read_range(self, device_id, start, end):
+        """All items with start <= sort key <= end, oldest first
+
+        Ranges longer than segment_ms are split into slices that are
+        queried in parallel and concatenated in order. Only a time window when
+        the sort key keeps growing across reboots (e.g. epoch milliseconds):
+        a device-uptime key restarts at 0, so a range mixes readings of
+        different boots.
+        """
+        segments = max(1, math.ceil((end - start + 1) / self.segment_ms))
+        bounds = [(start + i * self.segment_ms, min(start + (i + 1) * self.segment_ms - 1, end))
+                  for i in range(segments)]
+        if segments == 1:
+            parts = [self._pages(self._query(device_id, between=bounds[0]))]
+        else:
+            parts = self._executor.map(lambda b: self._pages(self._query(device_id, between=b)), bounds)
+        return self._frame([item for part in parts for item in part])
+
+    def stats(self):
+        with self._lock:
+            return {'queries': self.queries, 'pages': self.pages, 'items': self.items}
@@ -0,0 +1,149 @@
+"""
+Online harvest-time estimator for Algae Box tanks
+Fits each tank's turbidity growth incrementally, one reading at a time
+"""
+
+import math
+import threading
+from datetime import timedelta
+
+# Predictions further out than this are reported as unknown
+MAX_HORIZON_HOURS = 30 * 24
+
+
+class GrowthFit:
+    """Exponentially weighted least-squares fit of ln(1 + turbidity) over time
+
+    Keeps only decayed running sums, so an update is O(1) and nothing is
+    rescanned. The slope is the culture's log growth rate per hour.
+    """
+
+    __slots__ = ('origin', 'x_last', 'timestamp', 'sw', 'sx', 'sy', 'sxx', 'sxy')
+
+    def __init__(self):
+        self.origin = None        # time of x = 0 (the first point)
+        self.x_last = 0.0         # hours since origin of the newest point
+        self.timestamp = None     # newest point's timestamp
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def add(self, timestamp, turbidity, weight, half_life):
+        if self.origin is None:
+            self.origin = self.timestamp = timestamp
+        x = (timestamp - self.origin).total_seconds() / 3600
+        y = math.log1p(max(turbidity, 0.0))
+        if x > self.x_last:
+            # Age every earlier point instead of re-weighting them one by one
+            decay = 0.5 ** ((x - self.x_last) / half_life)
+            self.sw *= decay
+            self.sx *= decay
+            self.sy *= decay
+            self.sxx *= decay
+            self.sxy *= decay
+            self.x_last = x
+            self.timestamp = timestamp
+        else:
+            # A late (buffered) reading counts as much as its age allows
+            weight *= 0.5 ** ((self.x_last - x) / half_life)
+        self.sw += weight
+        self.sx += weight * x
+        self.sy += weight * y
+        self.sxx += weight * x * x
+        self.sxy += weight * x * y
+
+
+class HarvestEstimator:
+    """Per-tank growth fits and predicted time to harvest
+
+    `update` is called for every stored reading. Fits live in process
+    memory; a worker that has not seen a tank yet can `seed` it from hourly
+    rollup means (weighted by their reading counts) instead of raw history.
+    """
+
+    def __init__(self, half_life_hours=12.0, min_weight=3.0, min_span_hours=0.5):
+        self.half_life = half_life_hours
+        self.min_weight = min_weight
+        self.min_span = min_span_hours
+        self._fits = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def update(self, tank_id, timestamp, turbidity, weight=1.0):
+        """Fold one reading (or a pre-averaged point of `weight` readings) into the tank's fit"""
+        if turbidity is None:
+            return
+        with self._lock:
+            fit = self._fits.get(tank_id)
+            if fit is None:
+                fit = self._fits[tank_id] = GrowthFit()
+            fit.add(timestamp, turbidity, weight, self.half_life)
+            self.updates += 1
+
+    def seed(self, tank_id, points):
+        """Start a tank's fit from (timestamp, mean turbidity, count) points, unless it has one
+
+        A tank seeded with no points is still remembered, so it is not looked up again.
+        """
+        with self._lock:
+            if tank_id in self._fits:
+                return
+            fit = self._fits[tank_id] = GrowthFit()
+            for timestamp, turbidity, count in points:
+                if turbidity is not None:
+                    fit.add(timestamp, turbidity, count, self.half_life)
+
+    def known(self, tank_id):
+        return tank_id in self._fits
+
+    def reset(self, tank_id):
+        """Restart a tank's fit from its next reading (after a harvest or a history clear)"""
+        with self._lock:
+            self._fits[tank_id] = GrowthFit()
+
+    def forget(self, tank_id):
+        """Drop a deleted tank's fit"""
+        with self._lock:
+            self._fits.pop(tank_id, None)
+
+    def estimate(self, tank_id, target_ntu):
+        """Growth rate and predicted harvest time for a tank, or None without enough data
+
+        hours_to_harvest is 0 once the fitted turbidity reaches `target_ntu`
+        and None when the culture is not growing or the harvest is further
+        out than MAX_HORIZON_HOURS.
+        """
+        with self._lock:
+            fit = self._fits.get(tank_id)
+            if fit is None or fit.sw < self.min_weight:
+                return None
+            mean_x = fit.sx / fit.sw
+            mean_y = fit.sy / fit.sw
+            var_x = fit.sxx / fit.sw - mean_x * mean_x
+            if var_x < self.min_span ** 2:
+                return None
+            slope = (fit.sxy / fit.sw - mean_x * mean_y) / var_x
+            level = mean_y + slope * (fit.x_last - mean_x)
+            timestamp = fit.timestamp
+
+        target = math.log1p(target_ntu)
+        if level >= target:
+            hours = 0.0
+        elif slope > 0:
+            hours = (target - level) / slope
+            if hours > MAX_HORIZON_HOURS:
+                hours = None
+        else:
+            hours = None
+        return {
+            'fitted_turbidity_ntu': round(math.expm1(level), 1),
+            'growth_rate_per_day': round(math.expm1(min(slope * 24, 50.0)), 4),
+            'hours_to_harvest': round(hours, 1) if hours is not None else None,
+            'predicted_at': (timestamp + timedelta(hours=hours)).isoformat() if hours is not None else None
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tanks': len(self._fits),
+                'updates': self.updates,
+                'half_life_hours': self.half_life
+            }
@@ -0,0 +1,134 @@
+"""
+Write-behind ingestion buffer for sensor readings
+Acknowledges devices immediately and stores readings in group commits
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+
+
+class BufferFull(Exception):
+    """Raised when the buffer is at capacity and cannot accept more readings"""
+
+
+class IngestBuffer:
+    """Bounded in-process queue of readings flushed to the database in batches
+
+    A background thread calls `write_rows(rows)` whenever `batch_size` rows are
+    waiting or `flush_interval` seconds have passed, so many device posts share
+    one transaction (and one fsync) instead of committing individually.
+    """
+
+    def __init__(self, write_rows, max_size=10000, batch_size=200, flush_interval=1.0):
+        self.write_rows = write_rows
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = deque()
+        self._lock = threading.Lock()        # guards the queue and counters
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        """Start the background flusher and flush remaining rows at shutdown"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, row):
+        """Queue one reading row; raises BufferFull when at capacity"""
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.rejected += 1
+                raise BufferFull(f'Ingest buffer full ({self.max_size} readings queued)')
+            self._queue.append(row)
+            self.accepted += 1
+            depth = len(self._queue)
+
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write every queued row in batches of `batch_size`; returns rows stored"""
+        stored = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    count = min(self.batch_size, len(self._queue))
+                    batch = [self._queue.popleft() for _ in range(count)]
+                if not batch:
+                    return stored
+
+                start = time.perf_counter()
+                try:
+                    self.write_rows(batch)
+                except Exception:
+                    # Put the batch back in front so a locked database doesn't lose data
+                    with self._lock:
+                        self._queue.extendleft(reversed(batch))
+                        self.failed_flushes += 1
+                    raise
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                with self._lock:
+                    self.flushed_rows += len(batch)
+                    self.flush_count += 1
+                    self.last_flush_ms = elapsed_ms
+                    self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                    self._total_flush_ms += elapsed_ms
+                stored += len(batch)
+
+    def close(self):
+        """Stop the flusher thread and store whatever is still queued"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 5)
+        self.flush()
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before posting again"""
+        return max(1, int(round(self.flush_interval)))
+
+    def stats(self):
+        """Queue depth and flush counters for monitoring"""
+        with self._lock:
+            return {
+                'queue_depth': len(self._queue),
+                'max_size': self.max_size,
+                'batch_size': self.batch_size,
+                'flush_interval_s': self.flush_interval,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'flushed_rows': self.flushed_rows,
+                'flush_count': self.flush_count,
+                'failed_flushes': self.failed_flushes,
+                'last_flush_ms': round(self.last_flush_ms, 3),
+                'max_flush_ms': round(self.max_flush_ms, 3),
+                'avg_flush_ms': round(self._total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0
+            }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Ingest flush failed, will retry: {e}")
@@ -0,0 +1,125 @@
+"""
+Rule-based maintenance recommendations for Algae Box tanks
+Evaluates a rule table over many tanks' latest readings with pandas column operations
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Hourly rollups used for the averages and trends the drift rules look at
+TREND_HOURS = 6
+
+# Species threshold columns the rules compare readings against
+THRESHOLD_COLUMNS = ['ph_optimal', 'temp_optimal_c', 'harvest_turbidity_ntu']
+TREND_COLUMNS = ['ph_mean', 'turbidity_slope', 'temperature_slope']
+
+# `when` maps the tank frame (one row per tank) to a boolean Series;
+# `message` is formatted with that tank's row
+Rule = namedtuple('Rule', ['when', 'type', 'message', 'action'])
+
+
+def _always(frame):
+    return pd.Series(True, index=frame.index)
+
+
+# Each check lists its branches in order; the first branch that holds for a
+# tank gives that tank's advice for the check, and a check with no matching
+# branch gives none.
+RULES = [
+    ('ph', [
+        Rule(lambda f: f.ph < f.ph_optimal - 0.5, 'warning',
+             'pH too low ({ph:.2f}). Target: {ph_optimal:.1f}', 'Add CO2 or increase aeration'),
+        Rule(lambda f: f.ph > f.ph_optimal + 0.5, 'warning',
+             'pH too high ({ph:.2f}). Target: {ph_optimal:.1f}', 'Add acid or reduce CO2'),
+        Rule(_always, 'good', 'pH optimal ({ph:.2f})', 'Keep current conditions'),
+    ]),
+    ('temperature', [
+        Rule(lambda f: f.temperature_c < f.temp_optimal_c - 2, 'warning',
+             'Temperature too low ({temperature_c:.1f}°C). Target: {temp_optimal_c:.1f}°C', 'Increase heating'),
+        Rule(lambda f: f.temperature_c > f.temp_optimal_c + 2, 'warning',
+             'Temperature too high ({temperature_c:.1f}°C). Target: {temp_optimal_c:.1f}°C', 'Add cooling or reduce light'),
+        Rule(_always, 'good', 'Temperature optimal ({temperature_c:.1f}°C)', 'Maintain current temperature'),
+    ]),
+    ('turbidity', [
+        Rule(lambda f: f.turbidity_ntu > f.harvest_turbidity_ntu, 'action',
+             'Ready for harvest! Turbidity: {turbidity_ntu:.1f} NTU (Target: {harvest_turbidity_ntu:.1f})',
+             'Start collection process'),
+        Rule(lambda f: f.turbidity_ntu > f.harvest_turbidity_ntu * 0.8, 'info',
+             'Approaching harvest turbidity ({turbidity_ntu:.1f}/{harvest_turbidity_ntu:.1f} NTU)', 'Monitor closely'),
+        Rule(_always, 'info', 'Growing well ({turbidity_ntu:.1f} NTU)', 'Continue normal operation'),
+    ]),
+    ('ph_drift', [
+        Rule(lambda f: (f.ph - f.ph_mean).abs() > 0.3, 'info',
+             'pH moved {ph_change:+.2f} from its {trend_hours}h average ({ph_mean:.2f})',
+             'Check CO2 dosing and aeration'),
+    ]),
+    ('turbidity_trend', [
+        Rule(lambda f: f.turbidity_slope < -5, 'warning',
+             'Turbidity falling ({turbidity_slope:.1f} NTU/h over {trend_hours}h)',
+             'Check light, nutrients and for contamination'),
+    ]),
+    ('temperature_trend', [
+        Rule(lambda f: f.temperature_slope.abs() > 1, 'warning',
+             'Temperature changing quickly ({temperature_slope:+.1f}°C/h)', 'Check heater and cooling'),
+    ]),
+]
+
+
+def trend_features(hourly):
+    """Per-tank pH average and turbidity/temperature slopes (per hour)
+
+    `hourly` has one row per tank and hourly rollup: tank_id, bucket_start
+    and the <channel>_count and <channel>_sum columns. Returns a frame indexed by tank_id
+    with TREND_COLUMNS; slopes are NaN for tanks with fewer than two hours.
+    """
+    if hourly.empty:
+        return pd.DataFrame(columns=TREND_COLUMNS, index=pd.Index([], name='tank_id'), dtype=float)
+
+    hours = (hourly['bucket_start'] - hourly['bucket_start'].min()).dt.total_seconds() / 3600
+    df = pd.DataFrame({
+        'tank_id': hourly['tank_id'],
+        'x': hours,
+        'turbidity_ntu': hourly['turbidity_ntu_sum'] / hourly['turbidity_ntu_count'],
+        'temperature_c': hourly['temperature_c_sum'] / hourly['temperature_c_count']
+    })
+    tanks = hourly.groupby('tank_id')
+    features = pd.DataFrame({'ph_mean': tanks['ph_sum'].sum() / tanks['ph_count'].sum()})
+
+    # Least-squares slope of the hourly means per tank: cov(x, y) / var(x)
+    dx = df['x'] - df.groupby('tank_id')['x'].transform('mean')
+    var = (dx ** 2).groupby(df['tank_id']).sum()
+    for channel, name in (('turbidity_ntu', 'turbidity_slope'), ('temperature_c', 'temperature_slope')):
+        dy = df[channel] - df.groupby('tank_id')[channel].transform('mean')
+        features[name] = (dx * dy).groupby(df['tank_id']).sum() / var.where(var > 0)
+    return features
+
+
+def recommend(frame):
+    """Recommendations for each row of `frame`, as a list of lists of dicts
+
+    `frame` has one row per tank with the latest ph, temperature_c and
+    turbidity_ntu, the species THRESHOLD_COLUMNS and, optionally, the
+    TREND_COLUMNS from trend_features(). Every check is evaluated for all
+    tanks at once; only the message text is built per tank.
+    """
+    frame = frame.reset_index(drop=True)
+    for column in TREND_COLUMNS:
+        if column not in frame:
+            frame[column] = np.nan
+    frame = frame.assign(ph_change=frame['ph'] - frame['ph_mean'], trend_hours=TREND_HOURS)
+
+    records = frame.to_dict('records')
+    advice = [[] for _ in records]
+    for _, rules in RULES:
+        conditions = [rule.when(frame).fillna(False).to_numpy(dtype=bool) for rule in rules]
+        choice = np.select(conditions, np.arange(len(rules)), default=-1)
+        for row in np.flatnonzero(choice >= 0):
+            rule = rules[choice[row]]
+            advice[row].append({
+                'type': rule.type,
+                'message': rule.message.format(**records[row]),
+                'action': rule.action
+            })
+    return advice
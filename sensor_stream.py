@@ -0,0 +1,80 @@
+"""
+In-process broadcaster for live sensor readings (Server-Sent Events)
+Fans each stored reading out to every subscriber of its tank
+"""
+
+import queue
+import threading
+
+
+def format_event(event_id, data, event='reading'):
+    """Encode one Server-Sent Events message"""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """One client's queue of pending SSE messages for a tank"""
+
+    def __init__(self, tank_id, max_pending):
+        self.tank_id = tank_id
+        self.messages = queue.Queue(maxsize=max_pending)
+        self.overflowed = False  # Set when the client fell too far behind
+
+
+class ReadingBroadcaster:
+    """Publishes reading events to per-tank subscribers
+
+    Each subscriber has a bounded queue. A subscriber that falls more than
+    `max_pending` messages behind is cut off instead of growing memory;
+    its stream ends and the client reconnects with Last-Event-ID to replay
+    what it missed from the database.
+    """
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = {}  # tank_id -> set of Subscription
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped_subscribers = 0
+
+    def subscribe(self, tank_id):
+        subscription = Subscription(tank_id, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(tank_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.tank_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.tank_id]
+
+    def has_subscribers(self, tank_id):
+        return tank_id in self._subscribers
+
+    def publish(self, tank_id, event_id, message):
+        """Queue an already-encoded message for every subscriber of `tank_id`"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(tank_id, ()))
+        self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.messages.put_nowait((event_id, message))
+                self.delivered += 1
+            except queue.Full:
+                subscription.overflowed = True
+                self.unsubscribe(subscription)
+                self.dropped_subscribers += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tanks': len(self._subscribers),
+                'subscribers': sum(len(s) for s in self._subscribers.values()),
+                'published': self.published,
+                'delivered': self.delivered,
+                'dropped_subscribers': self.dropped_subscribers
+            }
@@ -0,0 +1,78 @@
+"""
+Process-wide species catalogue for Algae Box System
+Loads AlgaeSpecies once into an immutable lookup and revalidates it periodically
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# One immutable version of the catalogue; `etag` identifies its content
+CatalogSnapshot = namedtuple('CatalogSnapshot', ['species', 'by_name', 'etag'])
+
+
+class SpeciesCatalog:
+    """Read-only species lookup shared by all requests in a process
+
+    `load()` returns the species rows as a list of dicts. The snapshot is
+    rebuilt at most every `refresh_interval` seconds and only replaced when
+    its content hash changes, so callers can key derived data on `etag`.
+    """
+
+    def __init__(self, load, refresh_interval=300.0):
+        self.load = load
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.changes = 0
+        self.lookups = 0
+
+    def current(self):
+        """The current snapshot, revalidated against the database when due"""
+        self.lookups += 1
+        if self._snapshot is None or time.monotonic() - self._checked_at > self.refresh_interval:
+            with self._lock:
+                if self._snapshot is None or time.monotonic() - self._checked_at > self.refresh_interval:
+                    self._reload()
+        return self._snapshot
+
+    def get(self, name):
+        """Species record by name (read-only mapping), or None"""
+        return self.current().by_name.get(name)
+
+    def invalidate(self):
+        """Force a reload on the next lookup (e.g. after species are edited)"""
+        self._checked_at = 0.0
+
+    def stats(self):
+        """Lookup and reload counters"""
+        snapshot = self._snapshot
+        return {
+            'species': len(snapshot.species) if snapshot else 0,
+            'etag': snapshot.etag if snapshot else None,
+            'lookups': self.lookups,
+            'loads': self.loads,
+            'changes': self.changes,
+            'refresh_interval_s': self.refresh_interval
+        }
+
+    def _reload(self):
+        rows = self.load()
+        etag = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+        self.loads += 1
+        self._checked_at = time.monotonic()
+        if self._snapshot is not None and self._snapshot.etag == etag:
+            return
+
+        species = tuple(MappingProxyType(dict(row)) for row in rows)
+        self._snapshot = CatalogSnapshot(
+            species=species,
+            by_name=MappingProxyType({s['name']: s for s in species}),
+            etag=etag
+        )
+        self.changes += 1
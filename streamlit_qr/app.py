@@ -5,12 +5,33 @@ Replaces Flutter APK - accessible via QR code scan
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
 import pandas as pd
 from datetime import datetime, timedelta
 import time
 
+try:
+    import pyarrow as pa
+except ImportError:  # Fall back to JSON history
+    pa = None
+
 # Configuration
 BACKEND_URL = "https://labkason.pythonanywhere.com"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+REQUEST_TIMEOUT = 10
+HTTP_WORKERS = 8  # Concurrent backend requests (and kept-alive connections) per Streamlit process
+
+# Seconds a backend response is reused, shared by all viewers of the process
+CACHE_TTLS = {
+    'species': 300,
+    'tank': 60,
+    'recommendations': 10,
+    'history': 10,
+    'current': 5,
+}
+CACHE_MAX_ENTRIES = 1000
 
 st.set_page_config(
     page_title="Algae Box Monitor",
@@ -41,10 +62,145 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_http_session():
+    """Keep-alive connection pool shared by every viewer of this Streamlit process"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_executor():
+    """Worker threads that run a render's backend GETs side by side"""
+    return ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix="backend")
+
+
+class ResponseCache:
+    """TTL cache of successful backend GET responses, per data kind
+
+    Shared by every session of the Streamlit process. invalidate() drops a
+    tank's entries and bumps its generation, so a request that was already
+    in flight during a mutation does not put its stale response back.
+    """
+
+    def __init__(self, ttls, max_entries=CACHE_MAX_ENTRIES):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self._entries = {}       # (kind, tank_id, request key) -> (expires, response)
+        self._generations = {}   # tank_id -> invalidation count
+        self._lock = threading.Lock()
+        self.hits = dict.fromkeys(ttls, 0)
+        self.misses = dict.fromkeys(ttls, 0)
+
+    def generation(self, tank_id):
+        return self._generations.get(tank_id, 0)
+
+    def get(self, kind, tank_id, key):
+        with self._lock:
+            entry = self._entries.get((kind, tank_id, key))
+            if entry and entry[0] > time.monotonic():
+                self.hits[kind] += 1
+                return entry[1]
+            self.misses[kind] += 1
+            return None
+
+    def put(self, kind, tank_id, key, response, generation):
+        with self._lock:
+            if generation != self.generation(tank_id):
+                return
+            now = time.monotonic()
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[(kind, tank_id, key)] = (now + self.ttls[kind], response)
+
+    def invalidate(self, tank_id):
+        """Forget everything cached for a tank (after an edit, delete, harvest or history clear)"""
+        with self._lock:
+            self._generations[tank_id] = self.generation(tank_id) + 1
+            for k in [k for k in self._entries if k[1] == tank_id]:
+                del self._entries[k]
+
+    def stats(self):
+        """Hits, misses and hit rate per kind"""
+        with self._lock:
+            return [{
+                'kind': kind,
+                'ttl_s': self.ttls[kind],
+                'hits': self.hits[kind],
+                'misses': self.misses[kind],
+                'hit_rate': self.hits[kind] / (self.hits[kind] + self.misses[kind])
+                            if self.hits[kind] + self.misses[kind] else None
+            } for kind in self.ttls]
+
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(CACHE_TTLS)
+
+
+class RequestBatch:
+    """Backend GETs of one render, run on the shared pool
+
+    Identical calls (same path, params and headers) share one request, so
+    the page can prefetch everything up front and each fetch_* function
+    picks up the response that is already in flight. Calls with a `kind`
+    are answered from the response cache while fresh. Only the script
+    thread uses a batch; the worker threads never touch Streamlit.
+    """
+
+    def __init__(self, session, executor, cache):
+        self.session = session
+        self.executor = executor
+        self.cache = cache
+        self._futures = {}
+
+    def submit(self, path, params=None, headers=None, kind=None, tank_id=None):
+        key = (path, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        future = self._futures.get(key)
+        if future is None:
+            response = self.cache.get(kind, tank_id, key) if kind else None
+            if response is not None:
+                future = Future()
+                future.set_result(response)
+            else:
+                future = self.executor.submit(self._fetch, path, params, headers, kind, tank_id, key,
+                                              self.cache.generation(tank_id))
+            self._futures[key] = future
+        return future
+
+    def get(self, path, params=None, headers=None, kind=None, tank_id=None):
+        """Response for a GET; raises whatever requests raised"""
+        return self.submit(path, params, headers, kind, tank_id).result()
+
+    def _fetch(self, path, params, headers, kind, tank_id, key, generation):
+        response = self.session.get(f"{BACKEND_URL}{path}", params=params, headers=headers,
+                                    timeout=REQUEST_TIMEOUT)
+        if kind and response.status_code == 200:
+            self.cache.put(kind, tank_id, key, response, generation)
+        return response
+
+
+def begin_render():
+    """Start a fresh request batch for this run of the script"""
+    st.session_state['_requests'] = RequestBatch(get_http_session(), get_executor(), get_response_cache())
+
+
+def backend():
+    """This render's request batch"""
+    if '_requests' not in st.session_state:
+        begin_render()
+    return st.session_state['_requests']
+
+
 def fetch_tank_info(tank_id):
     """Fetch tank details from backend"""
     try:
-        response = requests.get(f"{BACKEND_URL}/api/tanks/{tank_id}", timeout=10)
+        response = backend().get(f"/api/tanks/{tank_id}", kind='tank', tank_id=tank_id)
         if response.status_code == 200:
             return response.json().get('tank')
     except Exception as e:
@@ -55,7 +211,7 @@ def fetch_tank_info(tank_id):
 def fetch_current_sensors(tank_id):
     """Fetch latest sensor readings"""
     try:
-        response = requests.get(f"{BACKEND_URL}/api/sensors/current/{tank_id}", timeout=10)
+        response = backend().get(f"/api/sensors/current/{tank_id}", kind='current', tank_id=tank_id)
         if response.status_code == 200:
             return response.json().get('reading')
     except Exception as e:
@@ -63,21 +219,89 @@ def fetch_current_sensors(tank_id):
     return None
 
 
-def fetch_sensor_history(tank_id, hours=24):
-    """Fetch sensor history for charts"""
+def history_request(tank_id, hours=24, max_points=500, after_id=None):
+    """(path, params, headers) of a history GET
+
+    Asks for an Arrow stream when pyarrow is available, so the points decode
+    straight into a DataFrame; otherwise asks for compact (columnar) JSON.
+    """
+    params = {'hours': hours, 'max_points': max_points}
+    if after_id is not None:
+        params['after_id'] = after_id
+    headers = {'Accept': f"{ARROW_MIMETYPE}, application/json;q=0.5"} if pa else {}
+    if not pa:
+        params['format'] = 'compact'
+    return f"/api/sensors/history/{tank_id}", params, headers
+
+
+def fetch_sensor_history(tank_id, hours=24, max_points=500, after_id=None):
+    """Fetch sensor history for charts (downsampled server-side to max_points)
+
+    Returns (DataFrame, next_after_id); pass `after_id` to fetch only the
+    buckets touched by readings stored since. Returns (None, after_id) if
+    the request failed.
+    """
     try:
-        response = requests.get(f"{BACKEND_URL}/api/sensors/history/{tank_id}?hours={hours}", timeout=10)
+        response = backend().get(*history_request(tank_id, hours, max_points, after_id),
+                                 kind='history', tank_id=tank_id)
         if response.status_code == 200:
-            return response.json().get('readings', [])
+            if pa and response.headers.get('Content-Type', '').startswith(ARROW_MIMETYPE):
+                df = pa.ipc.open_stream(response.content).read_pandas()
+                return df, response.headers.get('X-Next-After-Id')
+            data = response.json()
+            df = pd.DataFrame(data.get('readings', []))
+            if not df.empty:
+                compact = data.get('format') == 'compact'
+                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms' if compact else None)
+            return df, data.get('next_after_id')
     except Exception as e:
         st.error(f"Error fetching history: {e}")
-    return []
+    return None, after_id
+
+
+def load_sensor_history(tank_id, hours=24):
+    """Sensor history DataFrame kept in session state and extended with deltas
+
+    The first call downloads the whole window; later reruns only fetch the
+    buckets touched by readings stored after the last cursor (an id, so
+    late readings with old timestamps count too) and replace them in place.
+    """
+    key = f"history_{tank_id}_{hours}"
+    cached = st.session_state.get(key)
+    delta, next_after_id = fetch_sensor_history(tank_id, hours, after_id=history_cursor(tank_id, hours))
+    if delta is None:
+        return cached['df'] if cached else pd.DataFrame()
+
+    if cached is None or cached['df'].empty:
+        df = delta
+    elif delta.empty:
+        df = cached['df']
+    else:
+        df = pd.concat([cached['df'], delta]).drop_duplicates('timestamp', keep='last')
+
+    if not df.empty:
+        df = df.sort_values('timestamp')
+        df = df[df['timestamp'] >= df['timestamp'].max() - pd.Timedelta(hours=hours)]
+    st.session_state[key] = {'df': df, 'next_after_id': next_after_id}
+    return df
+
+
+def history_cursor(tank_id, hours=24):
+    """`after_id` cursor of the history kept in session state, if any"""
+    cached = st.session_state.get(f"history_{tank_id}_{hours}")
+    return cached['next_after_id'] if cached else None
+
+
+def reset_sensor_history(tank_id):
+    """Forget locally accumulated history (after it was cleared on the backend)"""
+    for key in [k for k in st.session_state.keys() if k.startswith(f"history_{tank_id}_")]:
+        del st.session_state[key]
 
 
 def fetch_recommendations(tank_id):
     """Fetch recommendations for tank"""
     try:
-        response = requests.get(f"{BACKEND_URL}/api/recommendations/{tank_id}", timeout=10)
+        response = backend().get(f"/api/recommendations/{tank_id}", kind='recommendations', tank_id=tank_id)
         if response.status_code == 200:
             return response.json().get('recommendations', [])
     except Exception as e:
@@ -88,7 +312,7 @@ def fetch_recommendations(tank_id):
 def fetch_species():
     """Fetch all algae species"""
     try:
-        response = requests.get(f"{BACKEND_URL}/api/species", timeout=10)
+        response = backend().get("/api/species", kind='species')
         if response.status_code == 200:
             return response.json().get('species', [])
     except Exception as e:
@@ -96,6 +320,21 @@ def fetch_species():
     return []
 
 
+def prefetch(tank_id, hours=24):
+    """Start every independent request of the page at once
+
+    The page then waits only for the slowest response instead of the sum
+    of all of them; the fetch_* calls below reuse these requests.
+    """
+    batch = backend()
+    batch.submit(f"/api/tanks/{tank_id}", kind='tank', tank_id=tank_id)
+    batch.submit(f"/api/sensors/current/{tank_id}", kind='current', tank_id=tank_id)
+    batch.submit(f"/api/recommendations/{tank_id}", kind='recommendations', tank_id=tank_id)
+    batch.submit("/api/species", kind='species')
+    batch.submit(*history_request(tank_id, hours, after_id=history_cursor(tank_id, hours)),
+                 kind='history', tank_id=tank_id)
+
+
 def get_status_color(is_safe):
     """Return color based on safety status"""
     return "status-ok" if is_safe else "status-danger"
@@ -105,12 +344,15 @@ def main():
     # Header
     st.title("🌿 Algae Box Monitor")
     st.caption(f"Monitoring Tank ID: {tank_id}")
+
+    begin_render()
+    prefetch(tank_id)
     
-    # Connection status
+    # Connection status (shares the tank info request)
     with st.sidebar:
         st.subheader("🔌 Connection Status")
         try:
-            response = requests.get(f"{BACKEND_URL}/api/tanks/{tank_id}", timeout=5)
+            response = backend().get(f"/api/tanks/{tank_id}")
             if response.status_code == 200:
                 st.success("✅ Backend Connected")
             else:
@@ -146,13 +388,14 @@ def main():
                     
                     if st.form_submit_button("💾 Save Changes"):
                         try:
-                            response = requests.put(f"{BACKEND_URL}/api/tanks/{tank_id}", json={
+                            response = get_http_session().put(f"{BACKEND_URL}/api/tanks/{tank_id}", json={
                                 "name": new_name,
                                 "algae_type": new_algae,
                                 "volume_liters": new_volume,
                                 "status": new_status
-                            }, timeout=10)
+                            }, timeout=REQUEST_TIMEOUT)
                             if response.status_code == 200:
+                                get_response_cache().invalidate(tank_id)
                                 st.success("✅ Tank updated!")
                                 st.rerun()
                             else:
@@ -165,8 +408,10 @@ def main():
                 st.warning("⚠️ This will delete all sensor history for this tank!")
                 if st.button("🗑️ Clear Sensor History", type="secondary"):
                     try:
-                        response = requests.delete(f"{BACKEND_URL}/api/sensors/history/{tank_id}", timeout=10)
+                        response = get_http_session().delete(f"{BACKEND_URL}/api/sensors/history/{tank_id}", timeout=REQUEST_TIMEOUT)
                         if response.status_code == 200:
+                            reset_sensor_history(tank_id)
+                            get_response_cache().invalidate(tank_id)
                             st.success("✅ Sensor history cleared!")
                             st.rerun()
                         else:
@@ -178,8 +423,9 @@ def main():
                 st.error("🚨 Delete this tank completely?")
                 if st.button("❌ Delete Tank", type="secondary"):
                     try:
-                        response = requests.delete(f"{BACKEND_URL}/api/tanks/{tank_id}", timeout=10)
+                        response = get_http_session().delete(f"{BACKEND_URL}/api/tanks/{tank_id}", timeout=REQUEST_TIMEOUT)
                         if response.status_code == 200:
+                            get_response_cache().invalidate(tank_id)
                             st.success("✅ Tank deleted!")
                             st.rerun()
                         else:
@@ -201,12 +447,12 @@ def main():
                 
                 if st.form_submit_button("Create Tank"):
                     try:
-                        response = requests.post(f"{BACKEND_URL}/api/tanks", json={
+                        response = get_http_session().post(f"{BACKEND_URL}/api/tanks", json={
                             "name": name,
                             "algae_type": algae_type,
                             "volume_liters": volume,
                             "notes": notes
-                        }, timeout=10)
+                        }, timeout=REQUEST_TIMEOUT)
                         if response.status_code == 201:
                             st.success("Tank created! Refresh the page.")
                             st.rerun()
@@ -218,6 +464,9 @@ def main():
     
     # Auto-refresh toggle
     auto_refresh = st.sidebar.checkbox("Auto-refresh (10s)", value=True)
+
+    with st.sidebar.expander("📦 Cache Stats"):
+        st.dataframe(pd.DataFrame(get_response_cache().stats()), hide_index=True)
     
     # Fetch current sensor data
     sensors = fetch_current_sensors(tank_id)
@@ -254,6 +503,11 @@ def main():
             )
         
         st.caption(f"Last updated: {sensors['timestamp']}")
+
+        forecast = sensors.get('harvest_forecast')
+        if forecast and forecast.get('hours_to_harvest'):
+            st.caption(f"🌾 Harvest predicted in ~{forecast['hours_to_harvest']:.0f}h "
+                       f"(growth {forecast['growth_rate_per_day'] * 100:+.0f}%/day)")
         
     else:
         st.info("📡 Waiting for sensor data... Make sure the ESP32 is connected and sending data.")
@@ -275,12 +529,8 @@ def main():
     st.markdown("---")
     st.subheader("📈 Sensor History (24h)")
     
-    history = fetch_sensor_history(tank_id, hours=24)
-    if history and len(history) > 1:
-        df = pd.DataFrame(history)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
+    df = load_sensor_history(tank_id, hours=24)
+    if len(df) > 1:
         tab1, tab2, tab3 = st.tabs(["pH", "Temperature", "Turbidity"])
         
         with tab1:
@@ -303,8 +553,9 @@ def main():
     with col1:
         if st.button("🌾 Start Harvest Collection"):
             try:
-                response = requests.post(f"{BACKEND_URL}/api/collection/start/{tank_id}", timeout=10)
+                response = get_http_session().post(f"{BACKEND_URL}/api/collection/start/{tank_id}", timeout=REQUEST_TIMEOUT)
                 if response.status_code == 200:
+                    get_response_cache().invalidate(tank_id)
                     st.success("Harvest collection started!")
                 else:
                     st.error(f"Failed: {response.text}")
@@ -313,6 +564,7 @@ def main():
     
     with col2:
         if st.button("🔄 Force Refresh"):
+            get_response_cache().invalidate(tank_id)
             st.rerun()
     
     # Auto-refresh
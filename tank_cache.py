@@ -0,0 +1,101 @@
+"""
+In-memory cache of each tank's latest state for the hot read endpoints
+Holds the tank, its resolved species thresholds and its latest reading
+"""
+
+import threading
+import time
+
+
+class TankState:
+    """Snapshot of one tank: plain dicts, safe to use after the DB session closes"""
+
+    __slots__ = ('tank', 'species', 'reading', 'trends', 'loaded_at', 'refreshed_at')
+
+    def __init__(self, tank, species, reading, trends=None):
+        self.tank = tank          # id, name, algae_type, volume_liters, status
+        self.species = species    # threshold columns of AlgaeSpecies, or None
+        self.reading = reading    # id, timestamp, ph, temperature_c, turbidity_ntu, or None
+        self.trends = trends      # recent averages/slopes from hourly rollups, or None
+        self.loaded_at = time.monotonic()     # when tank/species/trends were read
+        self.refreshed_at = self.loaded_at    # when the reading was last known current
+
+
+class TankStateCache:
+    """Per-process cache of TankState keyed by tank id
+
+    Ingest paths push new readings in with `update_reading`, and tank edits
+    or deletes call `invalidate`. An entry expires `ttl` seconds after its
+    reading was last refreshed, and `max_age` seconds after it was loaded
+    in any case. This bounds staleness when several worker processes each
+    hold a cache: a reading or tank edit handled by one worker is not seen
+    by the others' caches.
+    """
+
+    def __init__(self, ttl=30.0, max_age=300.0):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, tank_id):
+        """Cached state for a tank, or None on a miss"""
+        with self._lock:
+            state = self._entries.get(tank_id)
+            if state is not None and self.ttl:
+                now = time.monotonic()
+                if now - state.refreshed_at > self.ttl or now - state.loaded_at > self.max_age:
+                    del self._entries[tank_id]
+                    state = None
+            if state is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return state
+
+    def put(self, tank_id, tank, species, reading, trends=None):
+        """Store a freshly loaded state and return it"""
+        state = TankState(tank, species, reading, trends)
+        with self._lock:
+            self._entries[tank_id] = state
+        return state
+
+    def update_reading(self, tank_id, reading):
+        """Record a newly stored reading if it is newer than the cached one
+
+        Either way this process just wrote the tank's readings, so the entry's
+        reading counts as current again.
+        """
+        with self._lock:
+            state = self._entries.get(tank_id)
+            if state is None:
+                return
+            if state.reading is None or reading['timestamp'] >= state.reading['timestamp']:
+                state.reading = reading
+            state.refreshed_at = time.monotonic()
+
+    def invalidate(self, tank_id=None):
+        """Drop one tank's entry, or every entry when tank_id is None"""
+        with self._lock:
+            if tank_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(tank_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        """Entry count and hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'ttl_s': self.ttl,
+                'max_age_s': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,25 @@
+"""
+Shared test fixtures for the Algae Box backend
+"""
+
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """app_pythonanywhere, imported against a scratch database file"""
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_cors')
+    pytest.importorskip('sqlalchemy')
+    pytest.importorskip('pandas')
+    import database
+    # The app binds the module-level database on import
+    database.db = database.Database(f"sqlite:///{tmp_path_factory.mktemp('api') / 'api.db'}")
+    import app_pythonanywhere
+    return app_pythonanywhere
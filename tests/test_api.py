@@ -0,0 +1,94 @@
+"""
+Request-level checks of the sensor API
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture(scope='module')
+def tank_id(client):
+    """A tank with a few hours of readings"""
+    tank = {'name': 'Test tank', 'algae_type': 'Spirulina', 'volume_liters': 20}
+    response = client.post('/api/tanks', json=tank)
+    assert response.status_code == 201
+    tank_id = response.get_json()['tank']['id']
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=3)
+    readings = [{'tank_id': tank_id, 'turbidity': 20.0 + i, 'ph': 7.0, 'temperature': 24.0,
+                 'timestamp': (start + timedelta(minutes=10 * i)).isoformat()} for i in range(12)]
+    response = client.post('/api/sensors/reading/batch', json={'readings': readings})
+    assert response.get_json()['accepted'] == len(readings)
+    return tank_id
+
+
+@pytest.mark.parametrize('resolution', [None, 3600])
+def test_history_accepts_offset_aware_since(client, tank_id, resolution):
+    since = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    params = {'since': since}
+    if resolution:
+        params['resolution'] = resolution
+    response = client.get(f'/api/sensors/history/{tank_id}', query_string=params)
+    assert response.status_code == 200
+    assert response.get_json()['success']
+
+
+def test_history_accepts_offset_aware_cursor(client, tank_id):
+    cursor = f"{(datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()},0"
+    response = client.get(f'/api/sensors/history/{tank_id}', query_string={'cursor': cursor, 'limit': 5})
+    assert response.status_code == 200
+    assert response.get_json()['success']
+
+
+def test_first_ingest_seeds_growth_fit_from_history(api, client, tank_id):
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=6)
+    history = [{'tank_id': tank_id, 'turbidity_ntu': 50.0 * 1.1 ** i, 'ph': 7.0, 'temperature_c': 24.0,
+                'timestamp': start + timedelta(minutes=20 * i)} for i in range(12)]
+    session = api.db.get_session()
+    try:
+        api._insert_readings(session, history)  # Stored by another worker, unseen by this one
+        session.commit()
+    finally:
+        session.close()
+    api.harvest_estimator.forget(tank_id)
+
+    reading = {'tank_id': tank_id, 'turbidity': 200.0, 'ph': 7.0, 'temperature': 24.0}
+    assert client.post('/api/sensors/reading', json=reading).status_code == 200
+    fit = api.harvest_estimator._fits[tank_id]
+    assert fit.origin < start + timedelta(hours=1)
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_anomalies_rejects_non_positive_limit(client, tank_id, limit):
+    response = client.get(f'/api/sensors/anomalies/{tank_id}', query_string={'limit': limit})
+    assert response.status_code == 400
+
+
+def test_species_revalidation_keeps_the_weak_etag(client):
+    first = client.get('/api/species', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    for validator in (etag, etag[2:]):
+        response = client.get('/api/species', headers={'Accept-Encoding': 'gzip', 'If-None-Match': validator})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+
+
+def test_bucketed_delta_from_before_retention_reloads_the_window(client, tank_id):
+    params = {'resolution': 3600, 'hours': 6}
+    full = client.get(f'/api/sensors/history/{tank_id}', query_string=params).get_json()
+    assert full['readings']
+
+    current = client.get(f'/api/sensors/history/{tank_id}',
+                         query_string=dict(params, after_id=full['next_after_id'])).get_json()
+    assert current['readings'] == []
+
+    stale = client.get(f'/api/sensors/history/{tank_id}', query_string=dict(params, after_id=0)).get_json()
+    assert stale['readings'] == full['readings']
+    assert stale['next_after_id'] == full['next_after_id']
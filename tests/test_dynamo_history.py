@@ -0,0 +1,96 @@
+"""
+HistoryReader against a moto DynamoDB table
+"""
+
+import pytest
+
+pytest.importorskip('pandas')
+boto3 = pytest.importorskip('boto3')
+moto = pytest.importorskip('moto')
+
+from dynamo_history import HistoryReader
+
+TABLE = 'algae_readings'
+DEVICE = 'algae-box-01'
+PAGE_SIZE = 3
+
+
+class PagedClient:
+    """Client whose queries return at most PAGE_SIZE items, so every read spans several pages"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def query(self, **kwargs):
+        kwargs['Limit'] = min(kwargs.get('Limit', PAGE_SIZE), PAGE_SIZE)
+        return self._client.query(**kwargs)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        client = boto3.client('dynamodb', region_name='us-east-1')
+        client.create_table(
+            TableName=TABLE,
+            KeySchema=[{'AttributeName': 'device_id', 'KeyType': 'HASH'},
+                       {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'device_id', 'AttributeType': 'S'},
+                                  {'AttributeName': 'timestamp', 'AttributeType': 'N'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        for t in range(20):
+            item = {'device_id': {'S': DEVICE}, 'timestamp': {'N': str(t * 1000)},
+                    'temperature': {'N': str(24 + t / 10)}, 'ph': {'N': '7.25'},
+                    'turbidity_ntu': {'N': str(100 + t)}, 'status': {'S': 'ok'}}
+            if t % 2 == 0:
+                item['salinity'] = {'N': '35'}  # Only on some items
+            client.put_item(TableName=TABLE, Item=item)
+        # Another device's items must never leak into the reads
+        client.put_item(TableName=TABLE, Item={'device_id': {'S': 'other'}, 'timestamp': {'N': '5500'},
+                                               'temperature': {'N': '99'}})
+        yield PagedClient(client)
+
+
+def test_last_n_follows_pages_and_returns_oldest_first(client):
+    reader = HistoryReader(client, TABLE)
+    frame = reader.last_n(DEVICE, n=8)
+    assert frame['timestamp'].tolist() == [t * 1000 for t in range(12, 20)]
+    assert reader.stats()['pages'] == 3
+
+
+def test_last_n_stops_at_the_oldest_item(client):
+    reader = HistoryReader(client, TABLE)
+    frame = reader.last_n(DEVICE, n=50)
+    assert frame['timestamp'].tolist() == [t * 1000 for t in range(20)]
+
+
+def test_read_range_merges_segments_in_order(client):
+    reader = HistoryReader(client, TABLE, segment_ms=4000)
+    frame = reader.read_range(DEVICE, 1000, 17999)
+    assert frame['timestamp'].tolist() == [t * 1000 for t in range(1, 18)]
+    stats = reader.stats()
+    assert stats['queries'] == 5
+    assert stats['pages'] > stats['queries']
+    assert stats['items'] == 17
+
+
+def test_frame_types(client):
+    frame = HistoryReader(client, TABLE).read_range(DEVICE, 0, 3000)
+    assert frame['timestamp'].dtype == 'int64'
+    for name in ('temperature', 'ph', 'turbidity_ntu', 'salinity'):
+        assert frame[name].dtype == 'float64'
+    assert 'status' not in frame
+    assert frame['ph'].tolist() == [7.25] * 4
+    assert frame['salinity'].isna().tolist() == [False, True, False, True]
+
+
+def test_latest_decodes_numbers_as_float(client):
+    latest = HistoryReader(client, TABLE).latest(DEVICE)
+    assert latest['timestamp'] == 19000.0
+    assert isinstance(latest['turbidity_ntu'], float)
+    assert latest['ph'] == 7.25
+    assert 'salinity' not in latest
+    assert HistoryReader(client, TABLE).latest('missing') is None
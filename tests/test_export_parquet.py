@@ -0,0 +1,79 @@
+"""
+Parquet export against raw-reading retention
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pq = pytest.importorskip('pyarrow.parquet')
+
+import database
+
+
+@pytest.fixture
+def store(tmp_path):
+    db = database.Database(f"sqlite:///{tmp_path / 'export.db'}")
+    db.init_db()
+    return db
+
+
+def _add_readings(db, tank_id, timestamps):
+    session = db.get_session()
+    try:
+        rows = [{'tank_id': tank_id, 'timestamp': t, 'ph': 7.0, 'temperature_c': 25.0, 'turbidity_ntu': 100.0}
+                for t in timestamps]
+        session.bulk_insert_mappings(database.SensorReading, rows)
+        session.commit()
+    finally:
+        session.close()
+
+
+def _partitions(out_dir):
+    table_dir = os.path.join(out_dir, 'sensor_readings')
+    return {os.path.relpath(os.path.join(root, name), table_dir)
+            for root, _, files in os.walk(table_dir) for name in files if name.endswith('.parquet')}
+
+
+def test_purge_keeps_exported_partitions(store, tmp_path):
+    now = datetime(2026, 10, 16, 12, 0)
+    old_days = [now - timedelta(days=40), now - timedelta(days=35)]
+    # Hourly readings, so the retention cutoff day is only partly purged
+    cutoff = now - timedelta(days=database.RAW_RETENTION_DAYS)
+    cutoff_day = [cutoff.replace(hour=h) for h in range(0, 24, 6)]
+    _add_readings(store, 1, old_days + cutoff_day + [now])
+    out_dir = str(tmp_path / 'export')
+
+    first = store.export_parquet(out_dir, tables=['sensor_readings'], now=now)
+    exported = _partitions(out_dir)
+    assert first['tables']['sensor_readings']['written'] == 4
+
+    purged = store.purge_expired(now=now)['rows_purged']['sensor_readings']
+    assert purged == 2 + sum(t < cutoff for t in cutoff_day)
+
+    second = store.export_parquet(out_dir, tables=['sensor_readings'], now=now)
+    counters = second['tables']['sensor_readings']
+    assert counters['removed'] == 0
+    assert counters['written'] == 0
+    assert counters['archived'] == 3
+    assert _partitions(out_dir) == exported
+
+    cutoff_path = database._partition_path(out_dir, 'sensor_readings', 1, cutoff.date().isoformat())
+    assert pq.read_table(cutoff_path).num_rows == len(cutoff_day)
+    for day in old_days:
+        path = database._partition_path(out_dir, 'sensor_readings', 1, day.date().isoformat())
+        assert pq.read_table(path).num_rows == 1
+
+
+def test_deleted_recent_rows_are_removed(store, tmp_path):
+    now = datetime(2026, 10, 16, 12, 0)
+    _add_readings(store, 1, [now - timedelta(days=1), now])
+    out_dir = str(tmp_path / 'export')
+    store.export_parquet(out_dir, tables=['sensor_readings'], now=now)
+
+    store.delete_in_batches(database.SensorReading, database.SensorReading.timestamp < now - timedelta(hours=12))
+    counters = store.export_parquet(out_dir, tables=['sensor_readings'], now=now)['tables']['sensor_readings']
+    assert counters['removed'] == 1
+    assert len(_partitions(out_dir)) == 1
@@ -0,0 +1,138 @@
+"""
+The per-tank time-series queries behind the API seek an index
+
+Runs the API's own query builders against a seeded database, captures the
+SQL SQLAlchemy emits and checks SQLite's EXPLAIN QUERY PLAN: each query
+must seek the expected index, never scan sensor_readings or
+sensor_rollups, and only sort (temp B-tree) its grouped window rows.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('sqlalchemy')
+from sqlalchemy import event, insert, text
+
+# Plan fragment of a seek on a (tank_id, ...) composite index
+TANK_INDEX_SEEK = '(tank_id=?'
+
+TANKS = 5
+READINGS_PER_TANK = 2000
+
+
+@pytest.fixture(scope='module')
+def seeded(api):
+    """The API with TANKS tanks of READINGS_PER_TANK readings (5 minutes apart) and their rollups"""
+    import database
+    from database import Tank, SensorReading
+    session = database.db.get_session()
+    for i in range(TANKS):
+        session.add(Tank(name=f'Tank {i + 1}', algae_type='Spirulina', volume_liters=100))
+    session.commit()
+    start = datetime.now() - timedelta(days=7)
+    rows = [{'tank_id': t, 'timestamp': start + timedelta(seconds=300 * i),
+             'ph': 9.0, 'temperature_c': 33.0, 'turbidity_ntu': 100.0 + i / 10,
+             'anomaly_flags': 'ph:spike' if i % 100 == 0 else None}
+            for t in range(1, TANKS + 1) for i in range(READINGS_PER_TANK)]
+    session.execute(insert(SensorReading), rows)
+    database.apply_rollups(session, rows)
+    session.commit()
+    session.close()
+    with database.db.engine.begin() as conn:
+        conn.exec_driver_sql('ANALYZE')
+    return api
+
+
+@pytest.fixture
+def plan_of(seeded):
+    """plan_of(run) -> EXPLAIN QUERY PLAN details of the last query `run(session)` executes"""
+    import database
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(database.db.engine, 'before_cursor_execute', capture)
+    session = database.db.get_session()
+
+    def plan_of(run):
+        captured.clear()
+        run(session)
+        statement, parameters = [c for c in captured if not c[0].startswith('PRAGMA')][-1]
+        plan = session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+        return [row[-1] for row in plan]
+
+    yield plan_of
+    session.close()
+    event.remove(database.db.engine, 'before_cursor_execute', capture)
+
+
+def _hot_queries():
+    """name -> (run(api, session), expected plan fragment, grouped)"""
+    tank_id = 3
+    cutoff = datetime.now() - timedelta(hours=24)
+    page_key = (cutoff + timedelta(hours=1), 0)
+    return {
+        'latest sensor reading (current, recommendations)': (
+            lambda api, s: api._latest_reading_query(s, tank_id).first(), TANK_INDEX_SEEK, False),
+        'latest reading of every tank (fleet, bulk recommendations)': (
+            lambda api, s: api._latest_readings_query(s).all(), TANK_INDEX_SEEK, False),
+        'raw history window': (
+            lambda api, s: api._raw_history_query(s, tank_id, cutoff).all(), TANK_INDEX_SEEK, False),
+        'raw history page / export chunk': (
+            lambda api, s: api._raw_history_query(s, tank_id, cutoff, cursor=page_key)
+                              .limit(api.EXPORT_FETCH_SIZE).all(), TANK_INDEX_SEEK, False),
+        'flagged readings (anomalies)': (
+            lambda api, s: s.execute(api._anomalies_query(tank_id, cutoff, api.MAX_ANOMALIES)).all(),
+            TANK_INDEX_SEEK, False),
+        'bucketed history delta': (
+            lambda api, s: s.execute(api.HISTORY_DELTA_SQL,
+                                     {'tank_id': tank_id, 'after_id': 9000, 'cutoff': cutoff}).all(),
+            'USING INTEGER PRIMARY KEY (rowid>?)', False),
+        'stored id range (stale delta check)': (
+            lambda api, s: s.execute(api.HISTORY_ID_RANGE_SQL).all(), 'SEARCH sensor_readings', False),
+        'bucketed history from raw readings': (
+            lambda api, s: api._history_buckets(s, tank_id, cutoff, 30), TANK_INDEX_SEEK, True),
+        'bucketed history from rollups': (
+            lambda api, s: api._rollup_history(s, tank_id, cutoff, 3600, 3600), TANK_INDEX_SEEK, True),
+        'hourly sums from rollups (trends, harvest seeding)': (
+            lambda api, s: api._hourly_sums(s, [1, tank_id], cutoff), TANK_INDEX_SEEK, False),
+    }
+
+
+@pytest.mark.parametrize('name', list(_hot_queries()))
+def test_hot_query_seeks_index(seeded, plan_of, name):
+    run, expected, grouped = _hot_queries()[name]
+    details = plan_of(lambda session: run(seeded, session))
+    _assert_seeks(details, expected, grouped)
+
+
+def test_hourly_sums_raw_fallback_seeks_index(seeded, plan_of):
+    """Before an older file's rollups are backfilled, hourly sums group raw readings"""
+    import database
+    cutoff = datetime.now() - timedelta(hours=24)
+
+    def run(session):
+        session.execute(text('PRAGMA user_version = 0'))
+        try:
+            assert not database.rollups_backfilled(session)
+            seeded._hourly_sums(session, [1, 3], cutoff)
+        finally:
+            session.execute(text(f'PRAGMA user_version = {database.ROLLUPS_BACKFILLED_VERSION}'))
+
+    details = plan_of(run)
+    assert any('sensor_readings' in d for d in details), details
+    _assert_seeks(details, TANK_INDEX_SEEK, grouped=True)
+
+
+def _assert_seeks(details, expected, grouped):
+    plan = '\n'.join(details)
+    assert any(expected in d for d in details), plan
+    assert not any(d.startswith(('SCAN sensor_readings', 'SCAN sensor_rollups')) for d in details), plan
+    temp_sorts = [d for d in details if 'TEMP B-TREE' in d]
+    if grouped:
+        # Grouping the window's rows by a computed bucket sorts them; nothing else may
+        assert all('GROUP BY' in d for d in temp_sorts), plan
+    else:
+        assert not temp_sorts, plan